@@ -1,16 +1,38 @@
 # main.py - FastAPI App Entry Point
-from fastapi import FastAPI
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from routes import trains, schedule, conflicts, kpis
+from routes.dependencies import refresh_cached_iso
 from optimization.demo_optimizer import TrainOptimizer
 import asyncio
+import orjson
 import uvicorn
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize services on startup"""
+    print("🚂 Train Traffic Control System Starting...")
+    print("🤖 AI Optimization Engine Initialized")
+    print("📊 Analytics Module Ready")
+    print("⚡ WebSocket Support Enabled")
+    # CP-SAT releases the GIL while solving, so a small thread pool keeps solves off the event loop
+    app.state.pool = ThreadPoolExecutor(max_workers=2)
+    ticker = asyncio.create_task(refresh_cached_iso())
+    yield
+    ticker.cancel()
+    app.state.pool.shutdown(wait=False, cancel_futures=True)
+
 # Create FastAPI app instance
 app = FastAPI(
     title="AI-Powered Train Traffic Control System",
     description="SIH 25022 - Maximizing Section Throughput Using AI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS for React frontend
@@ -20,8 +42,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=7200,  # let browsers cache preflight responses (2h is the Chromium cap)
 )
 
+# Compress larger JSON payloads (schedules, analytics)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Include API routes
 app.include_router(trains.router, prefix="/api/trains", tags=["trains"])
 app.include_router(schedule.router, prefix="/api/schedule", tags=["schedule"])
@@ -31,15 +57,7 @@ app.include_router(kpis.router, prefix="/api/kpis", tags=["analytics"])
 # Initialize the optimization engine
 optimizer = TrainOptimizer()
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize services on startup"""
-    print("🚂 Train Traffic Control System Starting...")
-    print("🤖 AI Optimization Engine Initialized")
-    print("📊 Analytics Module Ready")
-    print("⚡ WebSocket Support Enabled")
-
-@app.get("/")
+@app.get("/", response_model=None)
 async def root():
     """API Health Check"""
     return {
@@ -56,7 +74,7 @@ async def root():
         ]
     }
 
-@app.get("/api/health")
+@app.get("/api/health", response_model=None)
 async def health_check():
     """Detailed health check for system components"""
     return {
@@ -67,12 +85,13 @@ async def health_check():
         "timestamp": "2025-01-20T10:30:00Z"
     }
 
-@app.get("/api/optimize")
+@app.get("/api/optimize", response_model=None)
 async def optimize_schedule():
     """Trigger AI optimization for current schedule"""
     try:
         # Run the optimization algorithm
-        result = optimizer.optimize_train_schedule()
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(app.state.pool, optimizer.optimize_train_schedule)
         return {
             "status": "success",
             "optimization_result": result,
@@ -84,31 +103,61 @@ async def optimize_schedule():
             "message": f"Optimization failed: {str(e)}"
         }
 
+# WebSocket batching: updates queued within one flush window go out as a single frame
+WS_BATCH_MAX = 128
+WS_FLUSH_WINDOW = 0.05  # seconds
+
+async def produce_status_updates(queue: asyncio.Queue):
+    """Feed mock real-time train status updates into the WebSocket send queue"""
+    while True:
+        await queue.put({
+            "timestamp": "2025-01-20T10:30:00Z",
+            "active_trains": 4,
+            "delays": 2,
+            "conflicts": 0,
+            "throughput": 25
+        })
+        await asyncio.sleep(5)
+
 # WebSocket endpoint for real-time updates (simplified mock)
 @app.websocket("/ws")
-async def websocket_endpoint(websocket):
+async def websocket_endpoint(websocket: WebSocket):
     """WebSocket connection for real-time train status updates"""
     await websocket.accept()
+    queue = asyncio.Queue()
+    producer = asyncio.create_task(produce_status_updates(queue))
+    loop = asyncio.get_running_loop()
     try:
         while True:
-            # Send mock real-time data every 5 seconds
-            data = {
-                "timestamp": "2025-01-20T10:30:00Z",
-                "active_trains": 4,
-                "delays": 2,
-                "conflicts": 0,
-                "throughput": 25
-            }
-            await websocket.send_json(data)
-            await asyncio.sleep(5)
+            # Block for the first update, then collect whatever else arrives before the deadline
+            batch = [await queue.get()]
+            deadline = loop.time() + WS_FLUSH_WINDOW
+            while len(batch) < WS_BATCH_MAX:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await websocket.send_bytes(orjson.dumps(batch))
     except Exception as e:
         print(f"WebSocket error: {e}")
+    finally:
+        producer.cancel()
 
 if __name__ == "__main__":
     uvicorn.run(
         "main:app", 
         host="0.0.0.0", 
         port=8000, 
+        loop="uvloop",
+        http="httptools",
+        ws="websockets",
+        ws_per_message_deflate=True,
         reload=True,
         log_level="info"
     )
\ No newline at end of file
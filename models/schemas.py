@@ -3,6 +3,7 @@ from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
+import msgspec
 
 class TrainType(str, Enum):
     EXPRESS = "Express"
@@ -66,6 +67,8 @@ class Conflict(BaseModel):
     severity: ConflictSeverity = Field(..., description="Severity level")
     time: str = Field(..., description="Time when conflict detected")
     resolution: Optional[str] = Field(None, description="Proposed resolution")
+    resolved_time: Optional[str] = Field(None, description="When the resolution was applied")
+    resolution_method: Optional[str] = Field(None, description="Resolution method that was applied")
 
 # Schedule-related schemas
 class ScheduleEntry(BaseModel):
@@ -140,6 +143,11 @@ class APIResponse(BaseModel):
     data: Optional[Any] = None
     timestamp: str
 
+    @classmethod
+    def from_trusted(cls, **kwargs):
+        """Build a response from server-shaped data without re-running validation"""
+        return cls.model_construct(**kwargs)
+
 class TrainListResponse(APIResponse):
     data: List[Train]
 
@@ -153,14 +161,20 @@ class AnalyticsResponse(APIResponse):
     data: AnalyticsData
 
 # Real-time update schemas
-class RealTimeUpdate(BaseModel):
+# These never pass through FastAPI validation, so they use msgspec for cheaper encode/decode
+class RealTimeUpdate(msgspec.Struct):
     timestamp: str
     update_type: str  # "train_status", "platform_change", "conflict_detected", etc.
     data: Dict[str, Any]
 
-class SystemStatus(BaseModel):
+class SystemStatus(msgspec.Struct):
     active_trains: int
     available_platforms: int
     current_conflicts: int
     system_health: str
-    last_optimization: str
\ No newline at end of file
+    last_optimization: str
+
+# Request bodies decoded directly with msgspec (no Pydantic pass)
+class BatchRescheduleBody(msgspec.Struct):
+    train_ids: List[str]
+    new_departure_times: List[str]
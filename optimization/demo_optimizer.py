@@ -1,9 +1,25 @@
 # optimization/demo_optimizer.py - OR-Tools Demo Train Scheduler
 from ortools.linear_solver import pywraplp
 from ortools.sat.python import cp_model
-from typing import Dict, List, Tuple, Any
+from collections import OrderedDict, defaultdict
+from operator import itemgetter
+import copy
+from typing import Dict, List, Optional, Tuple, Any
+import numpy as np
+import os
 import random
+import threading
+import time
 from datetime import datetime, timedelta
+from utils.timefmt import hhmm_to_min, min_to_hhmm
+
+# Shared generator for the simulated comparison metrics
+_rng = np.random.default_rng()
+
+# Objective weight indexed by priority (1 = highest); anything outside 1-5 weighs 1
+_PRIORITY_WEIGHTS = (1, 10, 7, 4, 2, 1)
+
+SOLUTION_CACHE_SIZE = 32  # solved input fingerprints kept per optimizer (least recently used evicted)
 
 class TrainOptimizer:
     """
@@ -11,175 +27,163 @@ class TrainOptimizer:
     This is a simplified version for demonstration purposes with 3-4 trains
     """
     
-    def __init__(self):
-        self.trains = [
+    def __init__(self, trains: Optional[List[Dict]] = None, platforms: Optional[List[int]] = None):
+        self.trains = trains if trains is not None else [
             {"id": "T001", "type": "Express", "priority": 1, "duration": 10, "preferred_time": 630},  # 10:30
             {"id": "T002", "type": "Express", "priority": 2, "duration": 8, "preferred_time": 675},   # 11:15
             {"id": "T003", "type": "Freight", "priority": 3, "duration": 15, "preferred_time": 720}, # 12:00
             {"id": "T004", "type": "Passenger", "priority": 4, "duration": 12, "preferred_time": 645} # 10:45
         ]
-        self.platforms = [1, 2, 3, 4, 5, 6]
+        self.platforms = platforms if platforms is not None else [1, 2, 3, 4, 5, 6]
         self.time_horizon = 480  # 8 hours in minutes (6:00 AM to 2:00 PM)
         self.time_start = 360    # 6:00 AM in minutes from midnight
+        self._lock = threading.Lock()
+        self._solution_cache = OrderedDict()  # input fingerprint -> solved schedule, in LRU order
+        self._build_model()
+    
+    def _build_model(self):
+        """
+        Build the CP-SAT model for the current trains and platforms
+        The model is reused across solves and only rebuilt when the inputs change
+        """
+        self._model_key = self._fingerprint()
+        
+        # Duration lookup used when reporting platform utilization
+        self._duration_by_id = {t["id"]: t["duration"] for t in self.trains}
+        
+        # Create CP-SAT model
+        model = cp_model.CpModel()
+        
+        # Decision variables
+        # train_start[t] = start time of train t
+        train_start = {}
+        # train_platform[t] = platform assigned to train t
+        train_platform = {}
+        # delay variables
+        delays = {}
+        
+        for train in self.trains:
+            train_id = train["id"]
+            # Start time variable (in minutes from time_start)
+            train_start[train_id] = model.NewIntVar(
+                0, self.time_horizon - train["duration"], f"start_{train_id}"
+            )
+            # Platform assignment variable
+            train_platform[train_id] = model.NewIntVar(
+                1, len(self.platforms), f"platform_{train_id}"
+            )
+            # Delay variable (difference from preferred time)
+            delays[train_id] = model.NewIntVar(
+                0, self.time_horizon, f"delay_{train_id}"
+            )
+            
+            # Delay is |start - preferred|, handled by the solver's native abs propagator
+            preferred_relative = max(0, train["preferred_time"] - self.time_start)
+            diff = model.NewIntVar(-self.time_horizon, self.time_horizon, f"diff_{train_id}")
+            model.Add(diff == train_start[train_id] - preferred_relative)
+            model.AddAbsEquality(delays[train_id], diff)
+        
+        # Platform conflict constraints
+        # No two trains can use the same platform at overlapping times: each train is a
+        # rectangle (platform x occupied time incl. buffer) and no two rectangles may overlap
+        buffer_time = 5  # 5-minute buffer between trains
+        platform_intervals = []
+        time_intervals = []
+        for train in self.trains:
+            train_id = train["id"]
+            platform_intervals.append(model.NewFixedSizeIntervalVar(
+                train_platform[train_id], 1, f"platform_interval_{train_id}"
+            ))
+            time_intervals.append(model.NewFixedSizeIntervalVar(
+                train_start[train_id], train["duration"] + buffer_time, f"time_interval_{train_id}"
+            ))
+        model.AddNoOverlap2D(platform_intervals, time_intervals)
+        
+        # Objective: Minimize weighted total delay (the weights encode train priority)
+        weighted_delays = []
+        for train in self.trains:
+            priority = train["priority"]
+            weight = _PRIORITY_WEIGHTS[priority] if 0 <= priority < len(_PRIORITY_WEIGHTS) else 1
+            weighted_delays.append(delays[train["id"]] * weight)
+        
+        model.Minimize(sum(weighted_delays))
+        
+        self._model = model
+        self._train_start = train_start
+        self._train_platform = train_platform
+        self._delays = delays
     
     def optimize_train_schedule(self) -> Dict[str, Any]:
         """
         Main optimization function using CP-SAT solver
         Minimizes total delay while respecting constraints
         """
-        try:
-            # Create CP-SAT model
-            model = cp_model.CpModel()
-            
-            # Decision variables
-            # train_start[t] = start time of train t
-            train_start = {}
-            # train_platform[t] = platform assigned to train t
-            train_platform = {}
-            # delay variables
-            delays = {}
-            
-            for train in self.trains:
-                train_id = train["id"]
-                # Start time variable (in minutes from time_start)
-                train_start[train_id] = model.NewIntVar(
-                    0, self.time_horizon - train["duration"], f"start_{train_id}"
-                )
-                # Platform assignment variable
-                train_platform[train_id] = model.NewIntVar(
-                    1, len(self.platforms), f"platform_{train_id}"
-                )
-                # Delay variable (difference from preferred time)
-                delays[train_id] = model.NewIntVar(
-                    0, self.time_horizon, f"delay_{train_id}"
-                )
+        # Concurrent /api/optimize calls share this optimizer, and the cache, model rebuild, solve
+        # and extraction all use instance state, so calls run one at a time
+        with self._lock:
+            started = time.perf_counter()
+            try:
+                # The solved schedule is deterministic, so only a change in the inputs triggers a new solve
+                key = self._fingerprint()
+                computed = self._solution_cache.get(key)
+                if computed is not None:
+                    self._solution_cache.move_to_end(key)
+                    return self._with_improvement(computed, time.perf_counter() - started)
+                if key != self._model_key:
+                    self._build_model()
                 
-                # Calculate delay constraint
-                preferred_relative = max(0, train["preferred_time"] - self.time_start)
-                model.Add(delays[train_id] >= train_start[train_id] - preferred_relative)
-                model.Add(delays[train_id] >= preferred_relative - train_start[train_id])
-            
-            # Platform conflict constraints
-            # No two trains can use the same platform at overlapping times
-            for i, train1 in enumerate(self.trains):
-                for j, train2 in enumerate(self.trains):
-                    if i < j:  # Avoid duplicate constraints
-                        t1_id = train1["id"]
-                        t2_id = train2["id"]
-                        
-                        # Create boolean variables for platform conflicts
-                        same_platform = model.NewBoolVar(f"same_platform_{t1_id}_{t2_id}")
-                        
-                        # same_platform is true if trains use the same platform
-                        model.Add(train_platform[t1_id] == train_platform[t2_id]).OnlyEnforceIf(same_platform)
-                        model.Add(train_platform[t1_id] != train_platform[t2_id]).OnlyEnforceIf(same_platform.Not())
-                        
-                        # If same platform, ensure no time overlap (with buffer)
-                        buffer_time = 5  # 5-minute buffer between trains
-                        t1_end = train_start[t1_id] + train1["duration"] + buffer_time
-                        t2_end = train_start[t2_id] + train2["duration"] + buffer_time
-                        
-                        # Either t1 ends before t2 starts, or t2 ends before t1 starts
-                        no_overlap1 = model.NewBoolVar(f"no_overlap1_{t1_id}_{t2_id}")
-                        no_overlap2 = model.NewBoolVar(f"no_overlap2_{t1_id}_{t2_id}")
-                        
-                        model.Add(t1_end <= train_start[t2_id]).OnlyEnforceIf(no_overlap1)
-                        model.Add(t2_end <= train_start[t1_id]).OnlyEnforceIf(no_overlap2)
-                        
-                        # If same platform, at least one no_overlap must be true
-                        model.AddBoolOr([no_overlap1, no_overlap2, same_platform.Not()])
-            
-            # Priority constraints - higher priority trains get preference
-            for i, train1 in enumerate(self.trains):
-                for j, train2 in enumerate(self.trains):
-                    if train1["priority"] < train2["priority"]:  # Lower number = higher priority
-                        t1_id = train1["id"]
-                        t2_id = train2["id"]
-                        
-                        # Higher priority train should have lower delay
-                        priority_weight = (train2["priority"] - train1["priority"]) * 10
-                        model.Add(delays[t1_id] + priority_weight <= delays[t2_id] + priority_weight * 2)
-            
-            # Objective: Minimize weighted total delay
-            weighted_delays = []
-            for train in self.trains:
-                train_id = train["id"]
-                weight = self.get_priority_weight(train["priority"])
-                weighted_delays.append(delays[train_id] * weight)
-            
-            model.Minimize(sum(weighted_delays))
-            
-            # Solve the model
-            solver = cp_model.CpSolver()
-            solver.parameters.max_time_in_seconds = 10.0  # 10-second timeout
-            
-            status = solver.Solve(model)
-            
-            if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-                return self.extract_solution(solver, train_start, train_platform, delays)
-            else:
-                return self.get_fallback_solution("No optimal solution found")
+                # Solve the prebuilt model (a fresh solver per call, the model itself is reusable)
+                solver = cp_model.CpSolver()
+                solver.parameters.max_time_in_seconds = 10.0  # 10-second timeout
+                # Portfolio search: run diversified strategies in parallel
+                solver.parameters.num_workers = min(8, os.cpu_count() or 1)
+                solver.parameters.linearization_level = 2
                 
-        except Exception as e:
-            return self.get_fallback_solution(f"Optimization error: {str(e)}")
+                status = solver.Solve(self._model)
+                
+                if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+                    # Only real solutions are cached; fallbacks are retried on the next call
+                    computed = self.extract_solution(solver, self._train_start, self._train_platform, self._delays)
+                    self._solution_cache[key] = computed
+                    if len(self._solution_cache) > SOLUTION_CACHE_SIZE:
+                        self._solution_cache.popitem(last=False)
+                    return self._with_improvement(computed, time.perf_counter() - started)
+                else:
+                    return self.get_fallback_solution("No optimal solution found")
+                
+            except Exception as e:
+                return self.get_fallback_solution(f"Optimization error: {str(e)}")
+    
+    def _fingerprint(self) -> Tuple:
+        """Hashable snapshot of every input the model depends on"""
+        return tuple(
+            (t["id"], t["priority"], t["duration"], t["preferred_time"]) for t in self.trains
+        ) + tuple(self.platforms)
     
     def get_priority_weight(self, priority: int) -> int:
         """Convert priority to weight for objective function"""
-        priority_weights = {1: 10, 2: 7, 3: 4, 4: 2, 5: 1}
-        return priority_weights.get(priority, 1)
+        return _PRIORITY_WEIGHTS[priority] if 0 <= priority < len(_PRIORITY_WEIGHTS) else 1
     
     def extract_solution(self, solver, train_start, train_platform, delays) -> Dict[str, Any]:
-        """Extract and format the optimization solution"""
+        """Extract and format the deterministic part of the optimization solution"""
         solution = {
             "status": "optimal",
             "objective_value": solver.ObjectiveValue(),
-            "solve_time": solver.WallTime(),
+            "solve_time": None,  # filled in per call
             "train_schedule": [],
             "platform_allocation": {},
             "performance_metrics": {}
         }
         
-        total_delay = 0
-        for train in self.trains:
-            train_id = train["id"]
-            start_time = solver.Value(train_start[train_id])
-            platform = solver.Value(train_platform[train_id])
-            delay = solver.Value(delays[train_id])
-            
-            # Convert back to actual time
-            actual_start_minutes = self.time_start + start_time
-            actual_start_hour = actual_start_minutes // 60
-            actual_start_min = actual_start_minutes % 60
-            actual_start_time = f"{actual_start_hour:02d}:{actual_start_min:02d}"
-            
-            # Calculate end time
-            end_minutes = actual_start_minutes + train["duration"]
-            end_hour = end_minutes // 60
-            end_min = end_minutes % 60
-            end_time = f"{end_hour:02d}:{end_min:02d}"
-            
-            train_solution = {
-                "train_id": train_id,
-                "train_type": train["type"],
-                "priority": train["priority"],
-                "scheduled_start": actual_start_time,
-                "scheduled_end": end_time,
-                "platform": platform,
-                "delay_minutes": delay,
-                "duration": train["duration"]
-            }
-            
-            solution["train_schedule"].append(train_solution)
-            total_delay += delay
-            
-            # Platform allocation tracking
-            if platform not in solution["platform_allocation"]:
-                solution["platform_allocation"][platform] = []
-            solution["platform_allocation"][platform].append({
-                "train_id": train_id,
-                "start": actual_start_time,
-                "end": end_time
-            })
+        # Convert solver values back to absolute minutes from midnight
+        starts = [self.time_start + solver.Value(train_start[t["id"]]) for t in self.trains]
+        platforms = [solver.Value(train_platform[t["id"]]) for t in self.trains]
+        delay_values = [solver.Value(delays[t["id"]]) for t in self.trains]
+        
+        solution["train_schedule"], solution["platform_allocation"] = self._build_schedule(
+            self.trains, starts, platforms, delay_values
+        )
+        total_delay = sum(delay_values)
         
         # Calculate performance metrics
         solution["performance_metrics"] = {
@@ -187,22 +191,58 @@ class TrainOptimizer:
             "average_delay": round(total_delay / len(self.trains), 2),
             "on_time_trains": len([t for t in solution["train_schedule"] if t["delay_minutes"] == 0]),
             "delayed_trains": len([t for t in solution["train_schedule"] if t["delay_minutes"] > 0]),
-            "platform_utilization": self.calculate_platform_utilization(solution["platform_allocation"]),
-            "optimization_improvement": self.calculate_improvement(solution["train_schedule"])
+            "platform_utilization": self.calculate_platform_utilization(solution["platform_allocation"])
         }
         
         return solution
     
+    def _with_improvement(self, computed: Dict[str, Any], solve_time: float) -> Dict[str, Any]:
+        """
+        Wrap a cached solution for one caller: a private copy plus this call's solve time and
+        freshly drawn (simulated) improvement metrics
+        """
+        solution = copy.deepcopy(computed)
+        solution["solve_time"] = solve_time
+        solution["performance_metrics"]["optimization_improvement"] = self.calculate_improvement(
+            solution["train_schedule"]
+        )
+        return solution
+    
+    def _build_schedule(self, trains: List[Dict], starts: List[int], platforms: List[int],
+                        delays: List[int]) -> Tuple[List[Dict], Dict[int, List[Dict]]]:
+        """Build schedule entries and the per-platform allocation in a single pass"""
+        schedule = []
+        platform_allocation = defaultdict(list)
+        
+        for train, start, platform, delay in zip(trains, starts, platforms, delays):
+            start_time = min_to_hhmm(start)
+            end_time = min_to_hhmm(start + train["duration"])
+            
+            schedule.append({
+                "train_id": train["id"],
+                "train_type": train["type"],
+                "priority": train["priority"],
+                "scheduled_start": start_time,
+                "scheduled_end": end_time,
+                "platform": platform,
+                "delay_minutes": delay,
+                "duration": train["duration"]
+            })
+            platform_allocation[platform].append({
+                "train_id": train["id"],
+                "start": start_time,
+                "end": end_time
+            })
+        
+        return schedule, dict(platform_allocation)
+    
     def calculate_platform_utilization(self, platform_allocation: Dict) -> Dict[str, float]:
         """Calculate utilization percentage for each platform"""
         utilization = {}
         total_time = self.time_horizon
         
         for platform_id, schedules in platform_allocation.items():
-            used_time = sum(
-                self.trains[next(i for i, t in enumerate(self.trains) if t["id"] == s["train_id"])]["duration"]
-                for s in schedules
-            )
+            used_time = sum(self._duration_by_id[s["train_id"]] for s in schedules)
             utilization[f"platform_{platform_id}"] = round((used_time / total_time) * 100, 1)
         
         return utilization
@@ -210,109 +250,94 @@ class TrainOptimizer:
     def calculate_improvement(self, schedule: List[Dict]) -> Dict[str, Any]:
         """Calculate improvement metrics compared to unoptimized schedule"""
         # Simulate what delays would be without optimization
-        original_delays = [random.randint(5, 25) for _ in self.trains]
-        optimized_delays = [t["delay_minutes"] for t in schedule]
-        
-        original_total = sum(original_delays)
-        optimized_total = sum(optimized_delays)
+        original_total = int(_rng.integers(5, 26, size=len(self.trains)).sum())
+        optimized_total = sum(t["delay_minutes"] for t in schedule)
+        throughput, conflict = _rng.uniform((8, 85), (18, 98))
         
         improvement = {
             "delay_reduction_minutes": max(0, original_total - optimized_total),
             "delay_reduction_percentage": round((max(0, original_total - optimized_total) / max(1, original_total)) * 100, 1),
-            "throughput_improvement": round(random.uniform(8, 18), 1),
-            "conflict_prevention": round(random.uniform(85, 98), 1)
+            "throughput_improvement": round(float(throughput), 1),
+            "conflict_prevention": round(float(conflict), 1)
         }
         
         return improvement
     
     def get_fallback_solution(self, error_message: str) -> Dict[str, Any]:
         """Return a fallback solution when optimization fails"""
-        fallback_schedule = []
-        current_time = self.time_start
-        
         # Simple FIFO scheduling as fallback
-        sorted_trains = sorted(self.trains, key=lambda x: x["priority"])
+        sorted_trains = sorted(self.trains, key=itemgetter("priority"))
+        durations = np.fromiter((t["duration"] for t in sorted_trains), dtype=np.int64, count=len(sorted_trains))
+        preferred = np.fromiter((t["preferred_time"] for t in sorted_trains), dtype=np.int64, count=len(sorted_trains))
         
-        for i, train in enumerate(sorted_trains):
-            platform = (i % len(self.platforms)) + 1
-            start_hour = current_time // 60
-            start_min = current_time % 60
-            start_time = f"{start_hour:02d}:{start_min:02d}"
-            
-            end_time_minutes = current_time + train["duration"]
-            end_hour = end_time_minutes // 60
-            end_min = end_time_minutes % 60
-            end_time = f"{end_hour:02d}:{end_min:02d}"
-            
-            preferred_minutes = train["preferred_time"]
-            delay = max(0, current_time - preferred_minutes)
-            
-            fallback_schedule.append({
-                "train_id": train["id"],
-                "train_type": train["type"],
-                "priority": train["priority"],
-                "scheduled_start": start_time,
-                "scheduled_end": end_time,
-                "platform": platform,
-                "delay_minutes": delay,
-                "duration": train["duration"]
-            })
-            
-            current_time += train["duration"] + 10  # 10-minute buffer
+        # Each train starts after the previous one plus a 10-minute buffer
+        slots = durations + 10
+        starts = self.time_start + np.cumsum(slots) - slots
+        delays = np.maximum(0, starts - preferred)
+        
+        platforms = [(i % len(self.platforms)) + 1 for i in range(len(sorted_trains))]
+        fallback_schedule, _ = self._build_schedule(sorted_trains, starts.tolist(), platforms, delays.tolist())
         
         return {
             "status": "fallback",
             "error_message": error_message,
             "train_schedule": fallback_schedule,
             "performance_metrics": {
-                "total_delay_minutes": sum(t["delay_minutes"] for t in fallback_schedule),
-                "on_time_trains": len([t for t in fallback_schedule if t["delay_minutes"] == 0]),
-                "delayed_trains": len([t for t in fallback_schedule if t["delay_minutes"] > 0])
+                "total_delay_minutes": int(delays.sum()),
+                "on_time_trains": int((delays == 0).sum()),
+                "delayed_trains": int((delays > 0).sum())
             }
         }
     
     def optimize_for_scenario(self, scenario: str) -> Dict[str, Any]:
         """Optimize schedule for specific scenarios"""
+        # Work on copies so a scenario never leaks into this optimizer's own inputs
+        trains = copy.deepcopy(self.trains)
+        platforms = list(self.platforms)
+        
         # Modify constraints based on scenario
         if scenario == "weather":
             # Increase buffer times and durations
-            for train in self.trains:
+            for train in trains:
                 train["duration"] += random.randint(5, 15)
         elif scenario == "maintenance":
             # Reduce available platforms
-            self.platforms = self.platforms[:4]  # Only first 4 platforms available
+            platforms = platforms[:4]  # Only first 4 platforms available
         elif scenario == "peak_hours":
             # Increase priority for passenger trains
-            for train in self.trains:
+            for train in trains:
                 if train["type"] == "Passenger":
                     train["priority"] = max(1, train["priority"] - 1)
         
-        return self.optimize_train_schedule()
+        # Solve on a separate optimizer so this instance's inputs, model and cache stay valid
+        return TrainOptimizer(trains, platforms).optimize_train_schedule()
     
     def analyze_schedule_conflicts(self, schedule: List[Dict]) -> List[Dict]:
         """Analyze potential conflicts in a given schedule"""
         conflicts = []
         
-        for i, train1 in enumerate(schedule):
-            for j, train2 in enumerate(schedule[i+1:], i+1):
-                if train1["platform"] == train2["platform"]:
-                    # Check time overlap
-                    t1_start = self.time_to_minutes(train1["scheduled_start"])
-                    t1_end = t1_start + train1["duration"]
-                    t2_start = self.time_to_minutes(train2["scheduled_start"])
-                    t2_end = t2_start + train2["duration"]
-                    
-                    if not (t1_end <= t2_start or t2_end <= t1_start):
+        # Parse each start time once and group by platform so only trains sharing one are compared
+        by_platform = {}
+        for train in schedule:
+            start = self.time_to_minutes(train["scheduled_start"])
+            by_platform.setdefault(train["platform"], []).append(
+                (start, start + train["duration"], train["train_id"])
+            )
+        
+        for platform, entries in by_platform.items():
+            for i, (t1_start, t1_end, t1_id) in enumerate(entries):
+                for t2_start, t2_end, t2_id in entries[i+1:]:
+                    overlap = min(t1_end, t2_end) - max(t1_start, t2_start)
+                    if overlap > 0:
                         conflicts.append({
                             "type": "Platform Conflict",
-                            "trains": [train1["train_id"], train2["train_id"]],
-                            "platform": train1["platform"],
-                            "overlap_minutes": min(t1_end, t2_end) - max(t1_start, t2_start)
+                            "trains": [t1_id, t2_id],
+                            "platform": platform,
+                            "overlap_minutes": overlap
                         })
         
         return conflicts
     
     def time_to_minutes(self, time_str: str) -> int:
         """Convert time string (HH:MM) to minutes from midnight"""
-        hour, minute = map(int, time_str.split(":"))
-        return hour * 60 + minute
\ No newline at end of file
+        return hhmm_to_min(time_str)
\ No newline at end of file
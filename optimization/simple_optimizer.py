@@ -1,7 +1,43 @@
 #optimization/simple_optimizer.py - Simple Fallback Optimizer (No OR-Tools Required)
-from typing import Dict, List, Any
+from typing import Dict, List, Optional, Tuple, Any
+import copy
+import heapq
+import numpy as np
 import random
 from datetime import datetime, timedelta
+from utils.timefmt import min_to_hhmm
+
+_rng = np.random.default_rng()
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; without it the kernel runs as plain Python
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+@njit(cache=True, boundscheck=False)
+def _greedy_schedule(order, duration, preferred_time, time_start, n_platforms):
+    """
+    Greedy core: assign trains in the given order to the earliest free platform
+    Returns (start_times, platform_indices) indexed like the input arrays
+    """
+    # Min-heap of (free_time, platform_index): earliest free platform pops first, lowest index on ties
+    heap = [(time_start, p) for p in range(n_platforms)]
+    heapq.heapify(heap)
+    starts = np.empty(order.shape[0], np.int64)
+    platforms = np.empty(order.shape[0], np.int64)
+    
+    for k in range(order.shape[0]):
+        i = order[k]
+        free, p = heapq.heappop(heap)
+        
+        # Start at the preferred time or when the platform frees up, whichever is later
+        start = max(max(time_start, preferred_time[i]), free)
+        starts[i] = start
+        platforms[i] = p
+        heapq.heappush(heap, (start + duration[i] + 5, p))  # 5-min buffer
+    
+    return starts, platforms
 
 class SimpleTrainOptimizer:
     """
@@ -9,108 +45,45 @@ class SimpleTrainOptimizer:
     Uses simple heuristic algorithms for demonstration
     """
     
-    def __init__(self):
-        self.trains = [
+    def __init__(self, trains: Optional[List[Dict]] = None, platforms: Optional[List[int]] = None):
+        self.trains = trains if trains is not None else [
             {"id": "T001", "type": "Express", "priority": 1, "duration": 10, "preferred_time": 630},  # 10:30
             {"id": "T002", "type": "Express", "priority": 2, "duration": 8, "preferred_time": 675},   # 11:15
             {"id": "T003", "type": "Freight", "priority": 3, "duration": 15, "preferred_time": 720}, # 12:00
             {"id": "T004", "type": "Passenger", "priority": 4, "duration": 12, "preferred_time": 645} # 10:45
         ]
-        self.platforms = [1, 2, 3, 4, 5, 6]
+        self.platforms = platforms if platforms is not None else [1, 2, 3, 4, 5, 6]
         self.time_start = 360    # 6:00 AM in minutes from midnight
+        self._schedule_cache = {}  # input fingerprint -> computed schedule
+        self._load_arrays()
+    
+    def _load_arrays(self):
+        """Mirror the train dicts as struct-of-arrays for the scheduling loop"""
+        self._priority = np.array([t["priority"] for t in self.trains], dtype=np.int32)
+        self._duration = np.array([t["duration"] for t in self.trains], dtype=np.int32)
+        self._preferred_time = np.array([t["preferred_time"] for t in self.trains], dtype=np.int32)
+        self._duration_by_id = {t["id"]: t["duration"] for t in self.trains}
+    
+    def _fingerprint(self) -> Tuple:
+        """Hashable snapshot of every input the schedule depends on"""
+        return tuple(
+            (t["id"], t["priority"], t["duration"], t["preferred_time"]) for t in self.trains
+        ) + tuple(self.platforms)
     
     def optimize_train_schedule(self) -> Dict[str, Any]:
         """
         Simple heuristic optimization - sorts by priority and assigns greedily
         """
         try:
-            # Sort trains by priority (lower number = higher priority)
-            sorted_trains = sorted(self.trains, key=lambda x: x["priority"])
-            
-            schedule = []
-            platform_usage = {}  # Track when each platform is free
-            
-            for platform in self.platforms:
-                platform_usage[platform] = self.time_start
-            
-            total_delay = 0
-            
-            for train in sorted_trains:
-                # Find the best platform (earliest available)
-                best_platform = min(platform_usage.keys(), key=lambda p: platform_usage[p])
-                
-                # Calculate start time (max of preferred time and platform availability)
-                preferred_absolute = max(self.time_start, train["preferred_time"])
-                start_time = max(preferred_absolute, platform_usage[best_platform])
-                
-                # Calculate delay
-                delay = max(0, start_time - train["preferred_time"])
-                total_delay += delay
-                
-                # Update platform availability
-                platform_usage[best_platform] = start_time + train["duration"] + 5  # 5-min buffer
-                
-                # Convert to time format
-                start_hour = start_time // 60
-                start_min = start_time % 60
-                start_time_str = f"{start_hour:02d}:{start_min:02d}"
-                
-                end_time = start_time + train["duration"]
-                end_hour = end_time // 60
-                end_min = end_time % 60
-                end_time_str = f"{end_hour:02d}:{end_min:02d}"
-                
-                schedule.append({
-                    "train_id": train["id"],
-                    "train_type": train["type"],
-                    "priority": train["priority"],
-                    "scheduled_start": start_time_str,
-                    "scheduled_end": end_time_str,
-                    "platform": best_platform,
-                    "delay_minutes": delay,
-                    "duration": train["duration"]
-                })
-            
-            # Calculate performance metrics
-            on_time_trains = len([t for t in schedule if t["delay_minutes"] == 0])
-            delayed_trains = len(schedule) - on_time_trains
-            
-            # Calculate platform allocation
-            platform_allocation = {}
-            for train_schedule in schedule:
-                platform = train_schedule["platform"]
-                if platform not in platform_allocation:
-                    platform_allocation[platform] = []
-                platform_allocation[platform].append({
-                    "train_id": train_schedule["train_id"],
-                    "start": train_schedule["scheduled_start"],
-                    "end": train_schedule["scheduled_end"]
-                })
-            
-            # Calculate improvement (mock comparison with unoptimized)
-            original_total_delay = sum([random.randint(10, 30) for _ in self.trains])
-            improvement = max(0, original_total_delay - total_delay)
+            # The greedy schedule is deterministic, so it is only recomputed when the inputs change
+            key = self._fingerprint()
+            computed = self._schedule_cache.get(key)
+            if computed is None:
+                self._load_arrays()  # the inputs changed since the arrays were built
+                computed = self._compute_schedule()
+                self._schedule_cache[key] = computed
             
-            return {
-                "status": "optimal",
-                "objective_value": total_delay,
-                "solve_time": round(random.uniform(0.1, 0.5), 3),
-                "train_schedule": schedule,
-                "platform_allocation": platform_allocation,
-                "performance_metrics": {
-                    "total_delay_minutes": total_delay,
-                    "average_delay": round(total_delay / len(self.trains), 2),
-                    "on_time_trains": on_time_trains,
-                    "delayed_trains": delayed_trains,
-                    "platform_utilization": self.calculate_platform_utilization(platform_allocation),
-                    "optimization_improvement": {
-                        "delay_reduction_minutes": improvement,
-                        "delay_reduction_percentage": round((improvement / max(1, original_total_delay)) * 100, 1),
-                        "throughput_improvement": round(random.uniform(8, 18), 1),
-                        "conflict_prevention": round(random.uniform(85, 98), 1)
-                    }
-                }
-            }
+            return self._decorate_with_noise(computed)
             
         except Exception as e:
             return {
@@ -120,16 +93,99 @@ class SimpleTrainOptimizer:
                 "performance_metrics": {}
             }
     
+    def _compute_schedule(self) -> Dict[str, Any]:
+        """Run the greedy assignment and derive the deterministic metrics"""
+        if not self.platforms:
+            raise ValueError("no platforms available")
+        
+        # Sort trains by priority (lower number = higher priority), ties keep input order
+        order = np.argsort(self._priority, kind="stable")
+        starts, assigned = _greedy_schedule(
+            order, self._duration, self._preferred_time, self.time_start, len(self.platforms)
+        )
+        order = order.tolist()
+        
+        delays = np.maximum(0, starts - self._preferred_time)
+        ends = starts + self._duration
+        total_delay = int(delays.sum())
+        
+        schedule = []
+        for i in order:
+            train = self.trains[i]
+            schedule.append({
+                "train_id": train["id"],
+                "train_type": train["type"],
+                "priority": train["priority"],
+                "scheduled_start": min_to_hhmm(starts[i]),
+                "scheduled_end": min_to_hhmm(ends[i]),
+                "platform": self.platforms[assigned[i]],
+                "delay_minutes": int(delays[i]),
+                "duration": train["duration"]
+            })
+        
+        # Calculate performance metrics
+        on_time_trains = len([t for t in schedule if t["delay_minutes"] == 0])
+        delayed_trains = len(schedule) - on_time_trains
+        
+        # Calculate platform allocation
+        platform_allocation = {}
+        for train_schedule in schedule:
+            platform = train_schedule["platform"]
+            if platform not in platform_allocation:
+                platform_allocation[platform] = []
+            platform_allocation[platform].append({
+                "train_id": train_schedule["train_id"],
+                "start": train_schedule["scheduled_start"],
+                "end": train_schedule["scheduled_end"]
+            })
+        
+        return {
+            "total_delay": total_delay,
+            "train_schedule": schedule,
+            "platform_allocation": platform_allocation,
+            "on_time_trains": on_time_trains,
+            "delayed_trains": delayed_trains,
+            "platform_utilization": self.calculate_platform_utilization(platform_allocation)
+        }
+    
+    def _decorate_with_noise(self, computed: Dict[str, Any]) -> Dict[str, Any]:
+        """Wrap a computed schedule with the simulated (random) comparison metrics"""
+        total_delay = computed["total_delay"]
+        computed = copy.deepcopy(computed)  # callers get a private copy; the cached one stays intact
+        
+        # Calculate improvement (mock comparison with unoptimized)
+        original_total_delay = int(_rng.integers(10, 31, size=len(self.trains)).sum())
+        improvement = max(0, original_total_delay - total_delay)
+        solve_time, throughput, conflict = _rng.uniform((0.1, 8, 85), (0.5, 18, 98)).tolist()
+        
+        return {
+            "status": "optimal",
+            "objective_value": total_delay,
+            "solve_time": round(solve_time, 3),
+            "train_schedule": computed["train_schedule"],
+            "platform_allocation": computed["platform_allocation"],
+            "performance_metrics": {
+                "total_delay_minutes": total_delay,
+                "average_delay": round(total_delay / len(self.trains), 2),
+                "on_time_trains": computed["on_time_trains"],
+                "delayed_trains": computed["delayed_trains"],
+                "platform_utilization": computed["platform_utilization"],
+                "optimization_improvement": {
+                    "delay_reduction_minutes": improvement,
+                    "delay_reduction_percentage": round((improvement / max(1, original_total_delay)) * 100, 1),
+                    "throughput_improvement": round(throughput, 1),
+                    "conflict_prevention": round(conflict, 1)
+                }
+            }
+        }
+    
     def calculate_platform_utilization(self, platform_allocation: Dict) -> Dict[str, float]:
         """Calculate utilization percentage for each platform"""
         utilization = {}
         total_time = 480  # 8 hours
         
         for platform_id, schedules in platform_allocation.items():
-            used_time = sum(
-                next(t["duration"] for t in self.trains if t["id"] == s["train_id"])
-                for s in schedules
-            )
+            used_time = sum(self._duration_by_id[s["train_id"]] for s in schedules)
             utilization[f"platform_{platform_id}"] = round((used_time / total_time) * 100, 1)
         
         # Fill in unused platforms
@@ -141,15 +197,20 @@ class SimpleTrainOptimizer:
     
     def optimize_for_scenario(self, scenario: str) -> Dict[str, Any]:
         """Optimize schedule for specific scenarios"""
+        # Work on copies so a scenario never leaks into this optimizer's own inputs
+        trains = copy.deepcopy(self.trains)
+        platforms = list(self.platforms)
+        
         # Modify train parameters based on scenario
         if scenario == "weather":
-            for train in self.trains:
+            for train in trains:
                 train["duration"] += random.randint(5, 15)
         elif scenario == "maintenance":
-            self.platforms = self.platforms[:4]  # Reduce available platforms
+            platforms = platforms[:4]  # Reduce available platforms
         elif scenario == "peak_hours":
-            for train in self.trains:
+            for train in trains:
                 if train["type"] == "Passenger":
                     train["priority"] = max(1, train["priority"] - 1)
         
-        return self.optimize_train_schedule()
\ No newline at end of file
+        # Solve on a separate optimizer so this instance's inputs, model and cache stay valid
+        return SimpleTrainOptimizer(trains, platforms).optimize_train_schedule()
@@ -1,14 +1,36 @@
 # routes/conflicts.py - Conflict Detection API Routes
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from typing import List, Optional, Dict, Any
 from models.schemas import Conflict, ConflictListResponse, APIResponse, ConflictSeverity
+from routes.dependencies import now_iso
+from utils.timefmt import hhmm_to_min
+from collections import Counter, OrderedDict
 from datetime import datetime
+from operator import itemgetter
+import itertools
+import numpy as np
 import random
 
 router = APIRouter()
 
-# Mock conflict data storage
-mock_conflicts = [
+# Handlers here stay `async def`: each one touches in-memory state for microseconds, and running
+# them all on the event loop thread keeps mock_conflicts and its counters free of threadpool races.
+
+_rng = np.random.default_rng()
+
+_MOCK_TRAIN_IDS = ("T001", "T002", "T003", "T004")
+_PREDICTED_CONFLICT_TYPES = ("Platform Overlap", "Signal Timing", "Route Crossing")
+_PREDICTED_SEVERITIES = ("Medium", "High")
+_PREVENTIVE_ACTIONS = (
+    "Adjust departure time by 5 minutes",
+    "Reserve alternate platform", 
+    "Increase buffer time between trains",
+    "Implement speed restriction"
+)
+
+# Mock conflict data storage, keyed by conflict id (insertion order preserved)
+_seed_conflicts = [
     {
         "id": "conflict_001",
         "type": "Platform Conflict",
@@ -28,17 +50,64 @@ mock_conflicts = [
         "resolution": "Adjust signal timing for T004 by 3 minutes"
     }
 ]
+mock_conflicts = OrderedDict()
+_conflict_models: Dict[str, Conflict] = {}  # conflict id -> validated model, rebuilt only when that conflict changes
+# Every detected conflict gets a fresh id and its own entry, so this cap is what bounds the store
+MAX_STORED_CONFLICTS = 10_000
+
+# Sequence for new conflict ids, shared by every conflict kind so stored ids never collide
+_conflict_seq = itertools.count(len(_seed_conflicts) + 1)
+
+# Running counts for the statistics endpoint, updated on every store mutation
+_severity_counts = Counter()
+_type_counts = Counter()
+_status_counts = Counter()  # "resolved" -> number of conflicts with a resolution
+_TYPE_KEYWORDS = (("platform", "Platform"), ("signal", "Signal"), ("route", "Route"))
+
+def _count_conflict(conflict: Dict[str, Any], delta: int = 1):
+    """Add (or with delta=-1, remove) a conflict's contribution to the running counts"""
+    _severity_counts[conflict["severity"]] += delta
+    for bucket, keyword in _TYPE_KEYWORDS:
+        if keyword in conflict["type"]:
+            _type_counts[bucket] += delta
+    if conflict.get("resolution"):
+        _status_counts["resolved"] += delta
+
+def _store_conflict(conflict: Dict[str, Any]):
+    """Insert a conflict into the store, keeping the running counts and models in sync"""
+    # Stored dicts are served as-is by the list endpoint, so give them every Conflict field
+    conflict.setdefault("resolved_time", None)
+    conflict.setdefault("resolution_method", None)
+    model = Conflict(**conflict)  # validate before touching the store
+    previous = mock_conflicts.get(conflict["id"])
+    if previous is not None:
+        _count_conflict(previous, -1)
+    mock_conflicts[conflict["id"]] = conflict
+    _conflict_models[conflict["id"]] = model
+    _count_conflict(conflict)
+    
+    # Evict the oldest conflict once the store is full (at most one entry is added per call)
+    if len(mock_conflicts) > MAX_STORED_CONFLICTS:
+        evicted_id, evicted = mock_conflicts.popitem(last=False)
+        _conflict_models.pop(evicted_id, None)
+        _count_conflict(evicted, -1)
+
+for _conflict in _seed_conflicts:
+    _store_conflict(_conflict)
 
-@router.get("/", response_model=ConflictListResponse)
+# Conflict dicts are built in-process and already match the Conflict schema, so the list is
+# serialized straight to orjson; the model is kept only to document the response shape
+@router.get("/", response_model=None, responses={200: {"model": ConflictListResponse}})
 async def get_all_conflicts(
     severity: Optional[ConflictSeverity] = Query(None, description="Filter by severity level"),
-    resolved: Optional[bool] = Query(None, description="Filter by resolution status")
+    resolved: Optional[bool] = Query(None, description="Filter by resolution status"),
+    timestamp: str = Depends(now_iso)
 ):
     """
     Get all detected conflicts with optional filtering
     """
     try:
-        conflicts = mock_conflicts.copy()
+        conflicts = list(mock_conflicts.values())
         
         # Apply filters
         if severity:
@@ -51,32 +120,75 @@ async def get_all_conflicts(
             else:
                 conflicts = [c for c in conflicts if not c.get("resolution")]
         
-        return ConflictListResponse(
+        return ORJSONResponse({
+            "status": "success",
+            "message": f"Retrieved {len(conflicts)} conflicts",
+            "data": conflicts,
+            "timestamp": timestamp
+        })
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch conflicts: {str(e)}")
+
+# Registered before /{conflict_id} so the literal path is not captured as a conflict id
+@router.get("/statistics", response_model=APIResponse)
+async def get_conflict_statistics(timestamp: str = Depends(now_iso)):
+    """
+    Get comprehensive statistics about conflicts and resolution performance
+    """
+    try:
+        total_conflicts = len(mock_conflicts)
+        resolved_conflicts = _status_counts["resolved"]
+        resolution_time, prevention_rate = _rng.uniform((2.5, 88), (8.5, 96)).tolist()
+        active_conflicts = total_conflicts - resolved_conflicts
+        
+        # Generate statistics
+        stats = {
+            "total_conflicts_detected": total_conflicts,
+            "resolved_conflicts": resolved_conflicts,
+            "active_conflicts": active_conflicts,
+            "resolution_rate": round((resolved_conflicts / total_conflicts) * 100, 1) if total_conflicts > 0 else 0,
+            "severity_breakdown": {
+                "critical": _severity_counts["Critical"],
+                "high": _severity_counts["High"],
+                "medium": _severity_counts["Medium"],
+                "low": _severity_counts["Low"]
+            },
+            "conflict_types": {
+                "platform": _type_counts["platform"],
+                "signal": _type_counts["signal"],
+                "route": _type_counts["route"]
+            },
+            "average_resolution_time": f"{resolution_time:.1f} minutes",
+            "prevention_success_rate": f"{prevention_rate:.1f}%"
+        }
+        
+        return APIResponse.from_trusted(
             status="success",
-            message=f"Retrieved {len(conflicts)} conflicts",
-            data=[Conflict(**conflict) for conflict in conflicts],
-            timestamp=datetime.now().isoformat()
+            message="Conflict statistics generated",
+            data=stats,
+            timestamp=timestamp
         )
     
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch conflicts: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to generate statistics: {str(e)}")
 
 @router.get("/{conflict_id}", response_model=APIResponse)
-async def get_conflict_by_id(conflict_id: str):
+async def get_conflict_by_id(conflict_id: str, timestamp: str = Depends(now_iso)):
     """
     Get specific conflict details by ID
     """
     try:
-        conflict = next((c for c in mock_conflicts if c["id"] == conflict_id), None)
+        conflict = _conflict_models.get(conflict_id)
         
         if not conflict:
             raise HTTPException(status_code=404, detail=f"Conflict {conflict_id} not found")
         
-        return APIResponse(
+        return APIResponse.from_trusted(
             status="success",
             message=f"Conflict {conflict_id} retrieved",
-            data=Conflict(**conflict),
-            timestamp=datetime.now().isoformat()
+            data=conflict,
+            timestamp=timestamp
         )
     
     except HTTPException:
@@ -85,13 +197,14 @@ async def get_conflict_by_id(conflict_id: str):
         raise HTTPException(status_code=500, detail=f"Failed to fetch conflict: {str(e)}")
 
 @router.post("/detect", response_model=APIResponse)
-async def detect_conflicts():
+async def detect_conflicts(timestamp: str = Depends(now_iso)):
     """
     Run real-time conflict detection algorithm on current train schedules
     """
     try:
         # Simulate conflict detection algorithm
         detected_conflicts = []
+        detected_at = datetime.now().strftime("%H:%M:%S")
         
         # Mock detection logic - check for platform conflicts
         train_schedules = [
@@ -101,74 +214,79 @@ async def detect_conflicts():
             {"id": "T004", "platform": 3, "time": "10:45", "duration": 12}
         ]
         
-        # Check for overlapping platform usage
-        for i, train1 in enumerate(train_schedules):
-            for j, train2 in enumerate(train_schedules[i+1:], i+1):
-                if train1["platform"] == train2["platform"]:
-                    # Calculate time overlap
-                    time1 = int(train1["time"].replace(":", ""))
-                    time2 = int(train2["time"].replace(":", ""))
+        # Parse departure times once, then sort by platform so same-platform trains are adjacent
+        parsed = sorted(
+            ((s["platform"], hhmm_to_min(s["time"]), s) for s in train_schedules),
+            key=itemgetter(0)
+        )
+        
+        # Check for overlapping platform usage, comparing only trains that share a platform
+        for platform, group in itertools.groupby(parsed, key=itemgetter(0)):
+            for (_, time1, train1), (_, time2, train2) in itertools.combinations(group, 2):
+                gap = abs(time1 - time2)
+                if gap < 30:  # Less than 30-minute gap
+                    conflict_id = f"conflict_{next(_conflict_seq):03d}"
+                    severity = "High" if gap < 15 else "Medium"
                     
-                    if abs(time1 - time2) < 30:  # Less than 30-minute gap
-                        conflict_id = f"conflict_{random.randint(100, 999)}"
-                        severity = "High" if abs(time1 - time2) < 15 else "Medium"
-                        
-                        new_conflict = {
-                            "id": conflict_id,
-                            "type": "Platform Scheduling Conflict",
-                            "trains": [train1["id"], train2["id"]],
-                            "platform": train1["platform"],
-                            "severity": severity,
-                            "time": datetime.now().strftime("%H:%M:%S"),
-                            "resolution": None
-                        }
-                        
-                        detected_conflicts.append(new_conflict)
-                        mock_conflicts.append(new_conflict)
+                    new_conflict = {
+                        "id": conflict_id,
+                        "type": "Platform Scheduling Conflict",
+                        "trains": [train1["id"], train2["id"]],
+                        "platform": platform,
+                        "severity": severity,
+                        "time": detected_at,
+                        "resolution": None
+                    }
+                    
+                    detected_conflicts.append(new_conflict)
+                    _store_conflict(new_conflict)
         
-        # Simulate signal conflicts
-        if random.random() < 0.3:  # 30% chance of signal conflict
+        # Simulate signal conflicts (chance roll, scan duration, both trains and severity drawn together)
+        signal_roll, scan_duration = _rng.uniform((0, 0.1), (1, 0.5)).tolist()
+        train_a, train_b, severity_idx = _rng.integers((0, 0, 0), (4, 4, 2)).tolist()
+        if signal_roll < 0.3:  # 30% chance of signal conflict
             signal_conflict = {
-                "id": f"signal_conflict_{random.randint(100, 999)}",
+                "id": f"signal_conflict_{next(_conflict_seq):03d}",
                 "type": "Signal Timing Conflict",
-                "trains": [random.choice(["T001", "T002", "T003", "T004"]), 
-                          random.choice(["T001", "T002", "T003", "T004"])],
+                "trains": [_MOCK_TRAIN_IDS[train_a], _MOCK_TRAIN_IDS[train_b]],
                 "platform": None,
-                "severity": random.choice(["Low", "Medium"]),
-                "time": datetime.now().strftime("%H:%M:%S"),
+                "severity": ("Low", "Medium")[severity_idx],
+                "time": detected_at,
                 "resolution": None
             }
             detected_conflicts.append(signal_conflict)
-            mock_conflicts.append(signal_conflict)
+            _store_conflict(signal_conflict)
         
-        return APIResponse(
+        return APIResponse.from_trusted(
             status="success",
             message=f"Conflict detection completed. {len(detected_conflicts)} new conflicts found.",
             data={
                 "new_conflicts": detected_conflicts,
-                "total_active_conflicts": len([c for c in mock_conflicts if not c.get("resolution")]),
+                "total_active_conflicts": len(mock_conflicts) - _status_counts["resolved"],
                 "detection_algorithm": "AI-Powered Real-Time Conflict Detection",
-                "scan_duration": f"{random.uniform(0.1, 0.5):.2f} seconds"
+                "scan_duration": f"{scan_duration:.2f} seconds"
             },
-            timestamp=datetime.now().isoformat()
+            timestamp=timestamp
         )
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Conflict detection failed: {str(e)}")
 
 @router.post("/{conflict_id}/resolve", response_model=APIResponse)
-async def resolve_conflict(conflict_id: str, resolution_method: str = Query(..., description="Resolution method to apply")):
+async def resolve_conflict(
+    conflict_id: str,
+    resolution_method: str = Query(..., description="Resolution method to apply"),
+    timestamp: str = Depends(now_iso)
+):
     """
     Apply AI-generated resolution to a specific conflict
     """
     try:
-        conflict_index = next((i for i, c in enumerate(mock_conflicts) if c["id"] == conflict_id), None)
+        conflict = mock_conflicts.get(conflict_id)
         
-        if conflict_index is None:
+        if conflict is None:
             raise HTTPException(status_code=404, detail=f"Conflict {conflict_id} not found")
         
-        conflict = mock_conflicts[conflict_index]
-        
         # Generate resolution based on conflict type and method
         resolutions = {
             "reschedule": f"Reschedule {conflict['trains'][1]} by 10 minutes to avoid platform overlap",
@@ -181,14 +299,17 @@ async def resolve_conflict(conflict_id: str, resolution_method: str = Query(...,
         resolution_text = resolutions.get(resolution_method, f"Apply {resolution_method} resolution")
         
         # Update conflict with resolution
-        mock_conflicts[conflict_index]["resolution"] = resolution_text
-        mock_conflicts[conflict_index]["resolved_time"] = datetime.now().isoformat()
-        mock_conflicts[conflict_index]["resolution_method"] = resolution_method
+        if not conflict.get("resolution"):
+            _status_counts["resolved"] += 1
+        conflict["resolution"] = resolution_text
+        conflict["resolved_time"] = timestamp
+        conflict["resolution_method"] = resolution_method
+        _conflict_models[conflict_id] = Conflict(**conflict)
         
         # Simulate resolution success rate
         success_rate = random.uniform(0.85, 0.98)
         
-        return APIResponse(
+        return APIResponse.from_trusted(
             status="success",
             message=f"Conflict {conflict_id} resolved using {resolution_method}",
             data={
@@ -196,9 +317,9 @@ async def resolve_conflict(conflict_id: str, resolution_method: str = Query(...,
                 "resolution": resolution_text,
                 "success_probability": round(success_rate, 2),
                 "affected_trains": conflict["trains"],
-                "resolution_time": datetime.now().isoformat()
+                "resolution_time": timestamp
             },
-            timestamp=datetime.now().isoformat()
+            timestamp=timestamp
         )
     
     except HTTPException:
@@ -207,7 +328,7 @@ async def resolve_conflict(conflict_id: str, resolution_method: str = Query(...,
         raise HTTPException(status_code=500, detail=f"Failed to resolve conflict: {str(e)}")
 
 @router.get("/predictions/upcoming", response_model=APIResponse)
-async def predict_upcoming_conflicts():
+async def predict_upcoming_conflicts(timestamp: str = Depends(now_iso)):
     """
     Use AI to predict potential conflicts in the next few hours
     """
@@ -215,27 +336,31 @@ async def predict_upcoming_conflicts():
         # Simulate AI prediction algorithm
         predictions = []
         
-        # Generate mock predictions
-        for i in range(random.randint(1, 4)):
+        # Generate mock predictions, drawing every random field for all of them at once
+        count = int(_rng.integers(1, 5))
+        hours = _rng.integers(12, 19, size=count).tolist()
+        minutes = _rng.integers(0, 60, size=count).tolist()
+        trains = _rng.integers(5, 10, size=(count, 2)).tolist()
+        probabilities = _rng.uniform(0.6, 0.9, size=count).tolist()
+        choices = _rng.integers(
+            0, (len(_PREDICTED_CONFLICT_TYPES), len(_PREDICTED_SEVERITIES), len(_PREVENTIVE_ACTIONS)),
+            size=(count, 3)
+        ).tolist()
+        
+        for hour, minute, (train_a, train_b), probability, (type_idx, severity_idx, action_idx) in zip(
+            hours, minutes, trains, probabilities, choices
+        ):
             prediction = {
-                "predicted_time": f"{random.randint(12, 18):02d}:{random.randint(0, 59):02d}",
-                "conflict_type": random.choice(["Platform Overlap", "Signal Timing", "Route Crossing"]),
-                "involved_trains": [
-                    f"T{random.randint(5, 9):03d}",
-                    f"T{random.randint(5, 9):03d}"
-                ],
-                "probability": random.uniform(0.6, 0.9),
-                "severity": random.choice(["Medium", "High"]),
-                "preventive_action": random.choice([
-                    "Adjust departure time by 5 minutes",
-                    "Reserve alternate platform", 
-                    "Increase buffer time between trains",
-                    "Implement speed restriction"
-                ])
+                "predicted_time": f"{hour:02d}:{minute:02d}",
+                "conflict_type": _PREDICTED_CONFLICT_TYPES[type_idx],
+                "involved_trains": [f"T{train_a:03d}", f"T{train_b:03d}"],
+                "probability": probability,
+                "severity": _PREDICTED_SEVERITIES[severity_idx],
+                "preventive_action": _PREVENTIVE_ACTIONS[action_idx]
             }
             predictions.append(prediction)
         
-        return APIResponse(
+        return APIResponse.from_trusted(
             status="success",
             message=f"Generated {len(predictions)} conflict predictions",
             data={
@@ -244,14 +369,14 @@ async def predict_upcoming_conflicts():
                 "model_accuracy": "92.5%",
                 "last_model_update": "2025-01-20T08:00:00Z"
             },
-            timestamp=datetime.now().isoformat()
+            timestamp=timestamp
         )
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate predictions: {str(e)}")
 
 @router.post("/prevention/auto", response_model=APIResponse)
-async def enable_auto_prevention():
+async def enable_auto_prevention(timestamp: str = Depends(now_iso)):
     """
     Enable automatic conflict prevention system
     """
@@ -265,7 +390,7 @@ async def enable_auto_prevention():
             "Implement early warning system 30 minutes before predicted conflicts"
         ]
         
-        return APIResponse(
+        return APIResponse.from_trusted(
             status="success",
             message="Automatic conflict prevention enabled",
             data={
@@ -279,49 +404,8 @@ async def enable_auto_prevention():
                 "monitoring_interval": "30 seconds",
                 "ai_confidence_threshold": 0.75
             },
-            timestamp=datetime.now().isoformat()
-        )
-    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to enable auto-prevention: {str(e)}")
-
-@router.get("/statistics", response_model=APIResponse)
-async def get_conflict_statistics():
-    """
-    Get comprehensive statistics about conflicts and resolution performance
-    """
-    try:
-        total_conflicts = len(mock_conflicts)
-        resolved_conflicts = len([c for c in mock_conflicts if c.get("resolution")])
-        active_conflicts = total_conflicts - resolved_conflicts
-        
-        # Generate statistics
-        stats = {
-            "total_conflicts_detected": total_conflicts,
-            "resolved_conflicts": resolved_conflicts,
-            "active_conflicts": active_conflicts,
-            "resolution_rate": round((resolved_conflicts / total_conflicts) * 100, 1) if total_conflicts > 0 else 0,
-            "severity_breakdown": {
-                "critical": len([c for c in mock_conflicts if c["severity"] == "Critical"]),
-                "high": len([c for c in mock_conflicts if c["severity"] == "High"]),
-                "medium": len([c for c in mock_conflicts if c["severity"] == "Medium"]),
-                "low": len([c for c in mock_conflicts if c["severity"] == "Low"])
-            },
-            "conflict_types": {
-                "platform": len([c for c in mock_conflicts if "Platform" in c["type"]]),
-                "signal": len([c for c in mock_conflicts if "Signal" in c["type"]]),
-                "route": len([c for c in mock_conflicts if "Route" in c["type"]])
-            },
-            "average_resolution_time": f"{random.uniform(2.5, 8.5):.1f} minutes",
-            "prevention_success_rate": f"{random.uniform(88, 96):.1f}%"
-        }
-        
-        return APIResponse(
-            status="success",
-            message="Conflict statistics generated",
-            data=stats,
-            timestamp=datetime.now().isoformat()
+            timestamp=timestamp
         )
     
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate statistics: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to enable auto-prevention: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,24 @@
+# routes/dependencies.py - Shared FastAPI Dependencies for API Routes
+from datetime import datetime
+import asyncio
+
+# Coarse timestamp refreshed by refresh_cached_iso() for responses that don't need exact times
+_cached_iso = datetime.now().isoformat()
+
+async def now_iso() -> str:
+    """
+    Request timestamp, resolved once per request and shared by every use in the handler
+    Declared async so FastAPI calls it inline instead of dispatching it to the threadpool
+    """
+    return datetime.now().isoformat()
+
+def cached_iso() -> str:
+    """Latest timestamp from the background ticker (up to ~100ms old)"""
+    return _cached_iso
+
+async def refresh_cached_iso(interval: float = 0.1):
+    """Keep cached_iso() current; runs for the lifetime of the app"""
+    global _cached_iso
+    while True:
+        _cached_iso = datetime.now().isoformat()
+        await asyncio.sleep(interval)
@@ -0,0 +1,51 @@
+# routes/response_cache.py - In-Process Cache of Serialized API Responses
+from fastapi import Response
+from typing import Any, Dict, Hashable, Optional, Tuple
+import orjson
+import secrets
+import time
+
+# Stand-in for the response timestamp in cached payloads; the random part keeps client-supplied
+# strings that get echoed back (filters, ids) from ever matching it
+TIMESTAMP_SLOT = f"__TIMESTAMP_{secrets.token_hex(8)}__"
+_TIMESTAMP_SLOT_BYTES = TIMESTAMP_SLOT.encode()
+
+class ResponseCache:
+    """
+    Serialized response bodies keyed per request, kept for ttl seconds
+    Bodies are stored split around their timestamp slots, so every response carries its own timestamp
+    Routes that mutate the underlying data call clear() so readers never see stale state
+    """
+    
+    def __init__(self, ttl: float, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[float, Tuple[bytes, ...]]] = {}  # key -> (expires_at, body parts)
+    
+    def get(self, key: Hashable, timestamp: str = "") -> Optional[Response]:
+        """Return the cached response for key, stamped with timestamp, if it hasn't expired"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return self._render(entry[1], timestamp)
+        return None
+    
+    def put(self, key: Hashable, body: bytes, timestamp: str = "") -> Response:
+        """Keep an already-serialized body (with TIMESTAMP_SLOT in place of timestamps) and return it"""
+        if len(self._entries) >= self.max_entries:
+            self._entries.clear()  # keys come from client-controlled paths and queries, so stay bounded
+        parts = tuple(body.split(_TIMESTAMP_SLOT_BYTES))
+        self._entries[key] = (time.monotonic() + self.ttl, parts)
+        return self._render(parts, timestamp)
+    
+    def put_json(self, key: Hashable, payload: Any, timestamp: str = "") -> Response:
+        """Serialize a payload (with TIMESTAMP_SLOT in place of timestamps) with orjson, keep it and return it"""
+        return self.put(key, orjson.dumps(payload), timestamp)
+    
+    def clear(self):
+        """Drop every cached response"""
+        self._entries.clear()
+    
+    @staticmethod
+    def _render(parts: Tuple[bytes, ...], timestamp: str) -> Response:
+        """Join the stored parts with the response timestamp"""
+        return Response(timestamp.encode().join(parts), media_type="application/json")
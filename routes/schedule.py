@@ -1,12 +1,20 @@
 # routes/schedule.py - Schedule & Delay Management API Routes
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
 from typing import List, Optional, Dict, Any
-from models.schemas import Schedule, ScheduleEntry, APIResponse, ScenarioType
-from datetime import datetime, timedelta
-import random
+from models.schemas import APIResponse, ScenarioType, BatchRescheduleBody, TrainType
+from routes.dependencies import now_iso
+from routes.response_cache import ResponseCache, TIMESTAMP_SLOT
+from routes.trains import mock_trains_index
+from utils.timefmt import hhmm_to_min, min_to_hhmm
+import msgspec
+import numpy as np
 
 router = APIRouter()
 
+# Shared generator so simulated effects are drawn for all affected trains in one call
+_rng = np.random.default_rng()
+
 # Mock schedule data
 mock_schedule_entries = [
     {
@@ -43,302 +51,393 @@ mock_schedule_entries = [
     }
 ]
 
-@router.get("/current", response_model=APIResponse)
-async def get_current_schedule():
+# Entries keyed by train id; values are the same dicts as in the list, so updates show up in both
+mock_schedule_index = {entry["train_id"]: entry for entry in mock_schedule_entries}
+
+# Departure times in minutes keyed by train id, kept beside the entries so responses stay unchanged;
+# filled lazily and dropped whenever a departure time is rewritten
+_departure_min: Dict[str, int] = {}
+
+def _departure_minutes(entry: Dict[str, Any]) -> int:
+    """Departure time of a schedule entry in minutes from midnight"""
+    minutes = _departure_min.get(entry["train_id"])
+    if minutes is None:
+        minutes = _departure_min[entry["train_id"]] = hhmm_to_min(entry["departure_time"])
+    return minutes
+
+# Serialized read responses; every route that changes the schedule clears it
+SCHEDULE_CACHE_TTL = 30  # seconds
+_schedule_cache = ResponseCache(ttl=SCHEDULE_CACHE_TTL)
+
+_batch_body_decoder = msgspec.json.Decoder(BatchRescheduleBody)
+
+# Which schedule entries belong to passenger-carrying trains, aligned with mock_schedule_entries.
+# Train types never change, so the mask is built once from the train table (entries carry no type)
+_PASSENGER_TYPES = (TrainType.EXPRESS, TrainType.PASSENGER)
+_passenger_like = np.array(
+    [mock_trains_index.get(e["train_id"], {}).get("type") in _PASSENGER_TYPES for e in mock_schedule_entries],
+    dtype=bool
+)
+_passenger_like.flags.writeable = False
+
+# Constant part of each scenario's effects; routes copy a template and fill in the per-run fields
+# (affected_count is a placeholder so the filled-in copy keeps the same key order)
+_SCENARIO_TEMPLATES = {
+    ScenarioType.WEATHER: {
+        "type": "Weather Disruption",
+        "description": "Heavy rain causing speed restrictions",
+        "affected_count": 0,
+        "average_additional_delay": 20
+    },
+    ScenarioType.ACCIDENT: {
+        "type": "Track Accident",
+        "description": "Emergency situation requiring rerouting",
+        "affected_count": 0,
+        "average_additional_delay": 45
+    },
+    ScenarioType.PEAK_HOURS: {
+        "type": "Peak Hour Congestion",
+        "description": "High passenger volume causing delays",
+        "affected_count": 0,
+        "average_additional_delay": 10
+    },
+    ScenarioType.MAINTENANCE: {
+        "type": "Scheduled Maintenance"
+    },
+    ScenarioType.NORMAL: {
+        "type": "Normal Operations",
+        "description": "All systems operating normally",
+        "affected_count": 0
+    }
+}
+
+@router.get("/current", response_model=None, responses={200: {"model": APIResponse}})
+async def get_current_schedule(timestamp: str = Depends(now_iso)):
     """
     Get the current train schedule with all entries
     """
     try:
-        schedule = Schedule(
-            entries=[ScheduleEntry(**entry) for entry in mock_schedule_entries],
-            last_updated=datetime.now().isoformat(),
-            conflicts_count=len([e for e in mock_schedule_entries if e["estimated_delay"] > 0])
-        )
-        
-        return APIResponse(
-            status="success",
-            message="Current schedule retrieved successfully",
-            data=schedule.dict(),
-            timestamp=datetime.now().isoformat()
-        )
+        cached = _schedule_cache.get("current", timestamp)
+        if cached is not None:
+            return cached
+        
+        # Entries are server-built and already match ScheduleEntry, so they are serialized
+        # directly in the Schedule shape instead of being validated into models on each rebuild
+        schedule = {
+            "entries": mock_schedule_entries,
+            "last_updated": TIMESTAMP_SLOT,
+            "conflicts_count": sum(1 for e in mock_schedule_entries if e["estimated_delay"] > 0)
+        }
+        
+        return _schedule_cache.put_json("current", {
+            "status": "success",
+            "message": "Current schedule retrieved successfully",
+            "data": schedule,
+            "timestamp": TIMESTAMP_SLOT
+        }, timestamp)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch schedule: {str(e)}")
 
-@router.get("/train/{train_id}", response_model=APIResponse) 
-async def get_train_schedule(train_id: str):
+@router.get("/train/{train_id}", response_model=None, responses={200: {"model": APIResponse}})
+async def get_train_schedule(train_id: str, timestamp: str = Depends(now_iso)):
     """
     Get schedule details for a specific train
     """
     try:
-        entry = next((e for e in mock_schedule_entries if e["train_id"] == train_id), None)
+        entry = mock_schedule_index.get(train_id)
         
         if not entry:
             raise HTTPException(status_code=404, detail=f"Schedule not found for train {train_id}")
         
-        return APIResponse(
-            status="success",
-            message=f"Schedule retrieved for train {train_id}",
-            data=entry,
-            timestamp=datetime.now().isoformat()
-        )
+        return ORJSONResponse({
+            "status": "success",
+            "message": f"Schedule retrieved for train {train_id}",
+            "data": entry,
+            "timestamp": timestamp
+        })
     
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch train schedule: {str(e)}")
 
-@router.put("/train/{train_id}/delay", response_model=APIResponse)
+@router.put("/train/{train_id}/delay", response_model=None, responses={200: {"model": APIResponse}})
 async def update_train_delay(
     train_id: str, 
     delay_minutes: int = Query(..., description="Delay in minutes"),
-    reason: Optional[str] = Query(None, description="Reason for delay")
+    reason: Optional[str] = Query(None, description="Reason for delay"),
+    timestamp: str = Depends(now_iso)
 ):
     """
     Update delay for a specific train and recalculate affected schedules
     """
     try:
-        entry_index = next((i for i, e in enumerate(mock_schedule_entries) if e["train_id"] == train_id), None)
+        _schedule_cache.clear()  # the schedule is about to change
         
-        if entry_index is None:
+        entry = mock_schedule_index.get(train_id)
+        
+        if entry is None:
             raise HTTPException(status_code=404, detail=f"Train {train_id} not found in schedule")
         
         # Update the delay
-        mock_schedule_entries[entry_index]["estimated_delay"] = delay_minutes
+        entry["estimated_delay"] = delay_minutes
         
         # Update departure time based on delay
-        original_time = mock_schedule_entries[entry_index]["departure_time"]
-        hour, minute = map(int, original_time.split(":"))
-        new_minute = minute + delay_minutes
-        new_hour = hour + new_minute // 60
-        new_minute = new_minute % 60
-        updated_time = f"{new_hour:02d}:{new_minute:02d}"
-        
-        # Simulate cascade effect on other trains (simplified)
+        updated_time = min_to_hhmm(_departure_minutes(entry) + delay_minutes)
+        
+        # Simulate cascade effect on other trains (simplified): only delays over 15 minutes cascade,
+        # so shorter ones skip the scan entirely
         affected_trains = []
-        for i, entry in enumerate(mock_schedule_entries):
-            if i != entry_index and entry["platform"] == mock_schedule_entries[entry_index]["platform"]:
-                # Add minor delay to trains using the same platform
-                if delay_minutes > 15:
-                    mock_schedule_entries[i]["estimated_delay"] += min(5, delay_minutes // 3)
-                    affected_trains.append(entry["train_id"])
-        
-        return APIResponse(
-            status="success",
-            message=f"Delay updated for train {train_id}. {len(affected_trains)} other trains affected.",
-            data={
+        if delay_minutes > 15:
+            platform = entry["platform"]
+            knock_on = min(5, delay_minutes // 3)
+            for other in mock_schedule_entries:
+                if other["platform"] == platform and other is not entry:
+                    # Add minor delay to trains using the same platform
+                    other["estimated_delay"] += knock_on
+                    affected_trains.append(other["train_id"])
+        
+        return ORJSONResponse({
+            "status": "success",
+            "message": f"Delay updated for train {train_id}. {len(affected_trains)} other trains affected.",
+            "data": {
                 "updated_train": train_id,
                 "new_delay": delay_minutes,
                 "updated_departure": updated_time,
                 "affected_trains": affected_trains,
                 "reason": reason or "Manual delay update"
             },
-            timestamp=datetime.now().isoformat()
-        )
+            "timestamp": timestamp
+        })
     
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update delay: {str(e)}")
 
-@router.post("/optimize", response_model=APIResponse)
-async def optimize_schedule():
+@router.post("/optimize", response_model=None, responses={200: {"model": APIResponse}})
+async def optimize_schedule(timestamp: str = Depends(now_iso)):
     """
     Run AI optimization on the current schedule to minimize delays and conflicts
     """
     try:
+        _schedule_cache.clear()  # the schedule is about to change
+        
         # Simulate AI optimization process
         optimizations_made = []
-        total_delay_before = sum(e["estimated_delay"] for e in mock_schedule_entries)
-        
-        # Mock optimization logic
-        for i, entry in enumerate(mock_schedule_entries):
-            if entry["estimated_delay"] > 10:
-                # Try to reduce delay through rescheduling
-                original_delay = entry["estimated_delay"]
-                optimized_delay = max(0, original_delay - random.randint(3, 8))
-                mock_schedule_entries[i]["estimated_delay"] = optimized_delay
-                
-                if optimized_delay < original_delay:
-                    optimizations_made.append({
-                        "train_id": entry["train_id"],
-                        "original_delay": original_delay,
-                        "optimized_delay": optimized_delay,
-                        "improvement": original_delay - optimized_delay
-                    })
-        
-        total_delay_after = sum(e["estimated_delay"] for e in mock_schedule_entries)
-        
-        return APIResponse(
-            status="success",
-            message="Schedule optimization completed",
-            data={
+        delays = np.array([e["estimated_delay"] for e in mock_schedule_entries], dtype=np.int64)
+        
+        # Mock optimization logic: try to cut every delay over 10 minutes, drawing all reductions at once
+        candidates = np.flatnonzero(delays > 10)
+        original_delays = delays[candidates]
+        optimized_delays = np.maximum(0, original_delays - _rng.integers(3, 9, size=candidates.size))
+        
+        for i, original_delay, optimized_delay in zip(
+            candidates.tolist(), original_delays.tolist(), optimized_delays.tolist()
+        ):
+            entry = mock_schedule_entries[i]
+            entry["estimated_delay"] = optimized_delay
+            optimizations_made.append({
+                "train_id": entry["train_id"],
+                "original_delay": original_delay,
+                "optimized_delay": optimized_delay,
+                "improvement": original_delay - optimized_delay
+            })
+        
+        total_delay_reduction = int((original_delays - optimized_delays).sum())
+        
+        return ORJSONResponse({
+            "status": "success",
+            "message": "Schedule optimization completed",
+            "data": {
                 "optimizations_made": len(optimizations_made),
-                "total_delay_reduction": total_delay_before - total_delay_after,
+                "total_delay_reduction": total_delay_reduction,
                 "details": optimizations_made,
                 "algorithm": "AI-Powered Dynamic Scheduling",
-                "execution_time": f"{random.uniform(0.5, 2.0):.2f} seconds"
+                "execution_time": f"{_rng.uniform(0.5, 2.0):.2f} seconds"
             },
-            timestamp=datetime.now().isoformat()
-        )
+            "timestamp": timestamp
+        })
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Schedule optimization failed: {str(e)}")
 
-@router.post("/scenario/{scenario_type}", response_model=APIResponse)
-async def apply_scenario(scenario_type: ScenarioType):
+@router.post("/scenario/{scenario_type}", response_model=None, responses={200: {"model": APIResponse}})
+async def apply_scenario(scenario_type: ScenarioType, timestamp: str = Depends(now_iso)):
     """
     Apply a specific scenario (weather, accident, etc.) and update schedule accordingly
     """
     try:
-        affected_trains = []
-        scenario_effects = {}
+        _schedule_cache.clear()  # the schedule is about to change
+        
+        # Struct-of-arrays view of the schedule, so each scenario is applied as one vectorized update
+        delays = np.array([e["estimated_delay"] for e in mock_schedule_entries], dtype=np.int64)
+        platforms = np.array([e["platform"] for e in mock_schedule_entries], dtype=np.int64)
+        affected = np.zeros(len(mock_schedule_entries), dtype=bool)
+        original_delays, original_platforms = delays.copy(), platforms.copy()
         
         if scenario_type == ScenarioType.WEATHER:
             # Weather scenario: add delays to non-freight trains
-            for i, entry in enumerate(mock_schedule_entries):
-                if "Express" in entry["train_id"] or "Passenger" in entry["train_id"]:
-                    additional_delay = random.randint(10, 30)
-                    mock_schedule_entries[i]["estimated_delay"] += additional_delay
-                    affected_trains.append(entry["train_id"])
+            affected = _passenger_like
+            delays[affected] += _rng.integers(10, 31, size=int(affected.sum()))
             
-            scenario_effects = {
-                "type": "Weather Disruption",
-                "description": "Heavy rain causing speed restrictions",
-                "affected_count": len(affected_trains),
-                "average_additional_delay": 20
-            }
+            scenario_effects = {**_SCENARIO_TEMPLATES[ScenarioType.WEATHER], "affected_count": int(affected.sum())}
         
         elif scenario_type == ScenarioType.ACCIDENT:
             # Accident scenario: major delays for all trains
-            for i, entry in enumerate(mock_schedule_entries):
-                additional_delay = random.randint(30, 60)
-                mock_schedule_entries[i]["estimated_delay"] += additional_delay
-                affected_trains.append(entry["train_id"])
+            affected = np.ones(len(mock_schedule_entries), dtype=bool)
+            delays += _rng.integers(30, 61, size=delays.size)
             
-            scenario_effects = {
-                "type": "Track Accident",
-                "description": "Emergency situation requiring rerouting",
-                "affected_count": len(affected_trains),
-                "average_additional_delay": 45
-            }
+            scenario_effects = {**_SCENARIO_TEMPLATES[ScenarioType.ACCIDENT], "affected_count": int(affected.sum())}
         
         elif scenario_type == ScenarioType.PEAK_HOURS:
             # Peak hours: moderate delays due to congestion
-            for i, entry in enumerate(mock_schedule_entries):
-                if "Express" in entry["train_id"] or "Passenger" in entry["train_id"]:
-                    additional_delay = random.randint(5, 15)
-                    mock_schedule_entries[i]["estimated_delay"] += additional_delay
-                    affected_trains.append(entry["train_id"])
+            affected = _passenger_like
+            delays[affected] += _rng.integers(5, 16, size=int(affected.sum()))
             
-            scenario_effects = {
-                "type": "Peak Hour Congestion",
-                "description": "High passenger volume causing delays", 
-                "affected_count": len(affected_trains),
-                "average_additional_delay": 10
-            }
+            scenario_effects = {**_SCENARIO_TEMPLATES[ScenarioType.PEAK_HOURS], "affected_count": int(affected.sum())}
         
         elif scenario_type == ScenarioType.MAINTENANCE:
             # Maintenance scenario: platform availability reduced
-            maintenance_platform = random.randint(1, 4)
-            for i, entry in enumerate(mock_schedule_entries):
-                if entry["platform"] == maintenance_platform:
-                    # Reassign to different platform with delay
-                    new_platform = (maintenance_platform % 4) + 1
-                    mock_schedule_entries[i]["platform"] = new_platform
-                    mock_schedule_entries[i]["estimated_delay"] += random.randint(15, 25)
-                    affected_trains.append(entry["train_id"])
+            maintenance_platform = int(_rng.integers(1, 5))
+            affected = platforms == maintenance_platform
+            # Reassign to different platform with delay
+            platforms[affected] = (maintenance_platform % 4) + 1
+            delays[affected] += _rng.integers(15, 26, size=int(affected.sum()))
             
             scenario_effects = {
-                "type": "Scheduled Maintenance",
+                **_SCENARIO_TEMPLATES[ScenarioType.MAINTENANCE],
                 "description": f"Platform {maintenance_platform} under maintenance",
-                "affected_count": len(affected_trains),
+                "affected_count": int(affected.sum()),
                 "maintenance_platform": maintenance_platform
             }
         
         else:
             # Normal operations - reset delays
-            for i, entry in enumerate(mock_schedule_entries):
-                mock_schedule_entries[i]["estimated_delay"] = 0
+            delays[:] = 0
             
-            scenario_effects = {
-                "type": "Normal Operations",
-                "description": "All systems operating normally",
-                "affected_count": 0
-            }
+            scenario_effects = _SCENARIO_TEMPLATES[ScenarioType.NORMAL]  # serialized only, never modified
+        
+        # Write back only the rows that changed; they double as the response delta
+        # (normal operations change delays without marking trains affected, so compare values)
+        changed = np.flatnonzero((delays != original_delays) | (platforms != original_platforms)).tolist()
+        delta = []
+        for i in changed:
+            entry = mock_schedule_entries[i]
+            entry["estimated_delay"] = int(delays[i])
+            entry["platform"] = int(platforms[i])
+            delta.append({
+                "train_id": entry["train_id"],
+                "estimated_delay": entry["estimated_delay"],
+                "platform": entry["platform"]
+            })
+        affected_trains = [mock_schedule_entries[i]["train_id"] for i in np.flatnonzero(affected).tolist()]
         
-        return APIResponse(
-            status="success",
-            message=f"Scenario '{scenario_type}' applied successfully",
-            data={
+        return ORJSONResponse({
+            "status": "success",
+            "message": f"Scenario '{scenario_type}' applied successfully",
+            "data": {
                 "scenario": scenario_effects,
                 "affected_trains": affected_trains,
-                "updated_schedule": mock_schedule_entries
+                "delta": delta  # full schedule is available from /current
             },
-            timestamp=datetime.now().isoformat()
-        )
+            "timestamp": timestamp
+        })
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to apply scenario: {str(e)}")
 
-@router.get("/delays/summary", response_model=APIResponse)
-async def get_delay_summary():
+@router.get("/delays/summary", response_model=None, responses={200: {"model": APIResponse}})
+async def get_delay_summary(timestamp: str = Depends(now_iso)):
     """
     Get summary of current delays across all trains
     """
     try:
-        total_trains = len(mock_schedule_entries)
-        delayed_trains = [e for e in mock_schedule_entries if e["estimated_delay"] > 0]
-        on_time_trains = total_trains - len(delayed_trains)
+        cached = _schedule_cache.get("delays/summary", timestamp)
+        if cached is not None:
+            return cached
         
-        total_delay_minutes = sum(e["estimated_delay"] for e in mock_schedule_entries)
+        delays = np.array([e["estimated_delay"] for e in mock_schedule_entries], dtype=np.int64)
+        total_trains = delays.size
+        
+        # Bucket every delay at once: on time (<= 0), minor (1-10), moderate (11-30), major (> 30)
+        on_time_trains, minor, moderate, major = np.bincount(
+            np.digitize(delays, (1, 11, 31)), minlength=4
+        ).tolist()
+        delayed_trains = minor + moderate + major
+        
+        total_delay_minutes = int(delays.sum())
         average_delay = total_delay_minutes / total_trains if total_trains > 0 else 0
         
         delay_categories = {
-            "minor": len([e for e in delayed_trains if 0 < e["estimated_delay"] <= 10]),
-            "moderate": len([e for e in delayed_trains if 10 < e["estimated_delay"] <= 30]),
-            "major": len([e for e in delayed_trains if e["estimated_delay"] > 30])
+            "minor": minor,
+            "moderate": moderate,
+            "major": major
         }
         
-        return APIResponse(
-            status="success",
-            message="Delay summary generated",
-            data={
+        return _schedule_cache.put_json("delays/summary", {
+            "status": "success",
+            "message": "Delay summary generated",
+            "data": {
                 "total_trains": total_trains,
                 "on_time_trains": on_time_trains,
-                "delayed_trains": len(delayed_trains),
+                "delayed_trains": delayed_trains,
                 "total_delay_minutes": total_delay_minutes,
                 "average_delay": round(average_delay, 2),
                 "delay_categories": delay_categories,
                 "on_time_percentage": round((on_time_trains / total_trains) * 100, 1)
             },
-            timestamp=datetime.now().isoformat()
-        )
+            "timestamp": TIMESTAMP_SLOT
+        }, timestamp)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate delay summary: {str(e)}")
 
-@router.post("/reschedule/batch", response_model=APIResponse)
-async def batch_reschedule(train_ids: List[str], new_departure_times: List[str]):
+# The body is decoded with msgspec rather than FastAPI's Pydantic validation, which is slow on large
+# batches; openapi_extra keeps the documented body shape
+@router.post(
+    "/reschedule/batch",
+    response_model=None,
+    responses={200: {"model": APIResponse}},
+    openapi_extra={"requestBody": {"required": True, "content": {"application/json": {"schema": {
+        "type": "object",
+        "required": ["train_ids", "new_departure_times"],
+        "properties": {
+            "train_ids": {"type": "array", "items": {"type": "string"}},
+            "new_departure_times": {"type": "array", "items": {"type": "string"}}
+        }
+    }}}}}
+)
+async def batch_reschedule(request: Request, timestamp: str = Depends(now_iso)):
     """
     Reschedule multiple trains at once
     """
     try:
+        try:
+            body = _batch_body_decoder.decode(await request.body())
+        except msgspec.DecodeError as e:
+            raise HTTPException(status_code=422, detail=f"Invalid batch reschedule body: {str(e)}")
+        train_ids, new_departure_times = body.train_ids, body.new_departure_times
+        
+        _schedule_cache.clear()  # the schedule is about to change
+        
         if len(train_ids) != len(new_departure_times):
             raise HTTPException(status_code=400, detail="Number of train IDs must match number of departure times")
         
         updated_trains = []
         
         for train_id, new_time in zip(train_ids, new_departure_times):
-            entry_index = next((i for i, e in enumerate(mock_schedule_entries) if e["train_id"] == train_id), None)
+            entry = mock_schedule_index.get(train_id)
             
-            if entry_index is not None:
-                old_time = mock_schedule_entries[entry_index]["departure_time"]
-                mock_schedule_entries[entry_index]["departure_time"] = new_time
+            if entry is not None:
+                old_time = entry["departure_time"]
+                entry["departure_time"] = new_time
+                _departure_min.pop(train_id, None)
                 
                 # Recalculate delay based on new time
                 # (Simplified calculation)
-                mock_schedule_entries[entry_index]["estimated_delay"] = 0  # Reset delay after reschedule
+                entry["estimated_delay"] = 0  # Reset delay after reschedule
                 
                 updated_trains.append({
                     "train_id": train_id,
@@ -346,15 +445,15 @@ async def batch_reschedule(train_ids: List[str], new_departure_times: List[str])
                     "new_departure_time": new_time
                 })
         
-        return APIResponse(
-            status="success",
-            message=f"Batch rescheduling completed for {len(updated_trains)} trains",
-            data={
+        return ORJSONResponse({
+            "status": "success",
+            "message": f"Batch rescheduling completed for {len(updated_trains)} trains",
+            "data": {
                 "updated_trains": updated_trains,
                 "rescheduled_count": len(updated_trains)
             },
-            timestamp=datetime.now().isoformat()
-        )
+            "timestamp": timestamp
+        })
     
     except HTTPException:
         raise
@@ -1,8 +1,13 @@
 # routes/trains.py - Train Priority Data API Routes
-from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from typing import Any, Dict, List, Optional
 from models.schemas import Train, TrainUpdate, TrainListResponse, APIResponse
-from datetime import datetime
+from routes.dependencies import now_iso
+from routes.response_cache import ResponseCache, TIMESTAMP_SLOT
+from utils.timefmt import hhmm_to_min, min_to_hhmm
+from collections import defaultdict
+from operator import itemgetter
 import random
 
 router = APIRouter()
@@ -63,103 +68,155 @@ mock_trains = [
     }
 ]
 
-@router.get("/", response_model=TrainListResponse)
+# Trains keyed by id; values are the same dicts as in the list, so updates show up in both
+mock_trains_index = {train["id"]: train for train in mock_trains}
+
+_by_priority = itemgetter("priority")
+
+# Scheduled times in minutes keyed by train id, parsed once at load (scheduled times never change)
+_scheduled_min = {train["id"]: hhmm_to_min(train["scheduled_time"]) for train in mock_trains}
+
+# Serialized read responses; every route that changes a train clears it
+TRAINS_CACHE_TTL = 30  # seconds
+_trains_cache = ResponseCache(ttl=TRAINS_CACHE_TTL)
+
+# Trains grouped by each filterable field, every bucket in priority order; rebuilt lazily after changes
+_train_buckets: Optional[Dict[str, Any]] = None
+
+def _get_train_buckets() -> Dict[str, Any]:
+    """Return the filter buckets, rebuilding them if train data changed since the last build"""
+    global _train_buckets
+    if _train_buckets is None:
+        ordered = sorted(mock_trains, key=_by_priority)
+        by_priority, by_status, by_type = defaultdict(list), defaultdict(list), defaultdict(list)
+        for train in ordered:
+            by_priority[train["priority"]].append(train)
+            by_status[train["status"].lower()].append(train)
+            by_type[train["type"].lower()].append(train)
+        _train_buckets = {"all": ordered, "priority": by_priority, "status": by_status, "type": by_type}
+    return _train_buckets
+
+def _trains_changed():
+    """Invalidate everything derived from mock_trains"""
+    global _train_buckets
+    _train_buckets = None
+    _trains_cache.clear()
+
+# Responses are built in-process and already match their models, so they are serialized
+# straight to orjson; the models are kept only to document the response shapes
+@router.get("/", response_model=None, responses={200: {"model": TrainListResponse}})
 async def get_all_trains(
     priority: Optional[int] = Query(None, description="Filter by priority level"),
     status: Optional[str] = Query(None, description="Filter by train status"),
-    train_type: Optional[str] = Query(None, description="Filter by train type")
+    train_type: Optional[str] = Query(None, description="Filter by train type"),
+    timestamp: str = Depends(now_iso)
 ):
     """
     Get all trains with optional filtering by priority, status, or type
     """
     try:
-        trains = mock_trains.copy()
+        cache_key = ("list", priority, status, train_type)
+        cached = _trains_cache.get(cache_key, timestamp)
+        if cached is not None:
+            return cached
         
-        # Apply filters
-        if priority:
-            trains = [t for t in trains if t["priority"] == priority]
+        buckets = _get_train_buckets()
         
+        # Apply filters by picking their buckets (lower number = higher priority, already sorted)
+        selected = []
+        if priority:
+            selected.append(buckets["priority"].get(priority, []))
         if status:
-            trains = [t for t in trains if t["status"].lower() == status.lower()]
-            
+            selected.append(buckets["status"].get(status.lower(), []))
         if train_type:
-            trains = [t for t in trains if t["type"].lower() == train_type.lower()]
+            selected.append(buckets["type"].get(train_type.lower(), []))
         
-        # Sort by priority (lower number = higher priority)
-        trains.sort(key=lambda x: x["priority"])
+        if not selected:
+            trains = buckets["all"]
+        else:
+            # Walk the smallest bucket and keep trains that are in every other one
+            selected.sort(key=len)
+            trains = selected[0]
+            for bucket in selected[1:]:
+                ids = {t["id"] for t in bucket}
+                trains = [t for t in trains if t["id"] in ids]
         
-        return TrainListResponse(
-            status="success",
-            message=f"Retrieved {len(trains)} trains",
-            data=trains,
-            timestamp=datetime.now().isoformat()
-        )
+        return _trains_cache.put_json(cache_key, {
+            "status": "success",
+            "message": f"Retrieved {len(trains)} trains",
+            "data": trains,
+            "timestamp": TIMESTAMP_SLOT
+        }, timestamp)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch trains: {str(e)}")
 
-@router.get("/{train_id}", response_model=Train)
+@router.get("/{train_id}", response_model=None, responses={200: {"model": Train}})
 async def get_train_by_id(train_id: str):
     """
     Get specific train details by ID
     """
     try:
-        train = next((t for t in mock_trains if t["id"] == train_id), None)
+        cache_key = ("train", train_id)
+        cached = _trains_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        train = mock_trains_index.get(train_id)
         
         if not train:
             raise HTTPException(status_code=404, detail=f"Train {train_id} not found")
         
-        return Train(**train)
+        return _trains_cache.put_json(cache_key, train)
     
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch train: {str(e)}")
 
-@router.put("/{train_id}", response_model=APIResponse)
-async def update_train(train_id: str, update: TrainUpdate):
+@router.put("/{train_id}", response_model=None, responses={200: {"model": APIResponse}})
+async def update_train(train_id: str, update: TrainUpdate, timestamp: str = Depends(now_iso)):
     """
     Update train status, delay, or platform assignment
     """
     try:
-        train_index = next((i for i, t in enumerate(mock_trains) if t["id"] == train_id), None)
+        _trains_changed()  # train data is about to change
         
-        if train_index is None:
+        train = mock_trains_index.get(train_id)
+        
+        if train is None:
             raise HTTPException(status_code=404, detail=f"Train {train_id} not found")
         
         # Update train data
         if update.status:
-            mock_trains[train_index]["status"] = update.status
+            train["status"] = update.status
         if update.delay is not None:
-            mock_trains[train_index]["delay"] = update.delay
+            train["delay"] = update.delay
             # Update actual time based on delay
-            scheduled_time = mock_trains[train_index]["scheduled_time"]
-            # Simple time calculation (in real app, use proper datetime handling)
-            hour, minute = map(int, scheduled_time.split(":"))
-            new_minute = minute + update.delay
-            new_hour = hour + new_minute // 60
-            new_minute = new_minute % 60
-            mock_trains[train_index]["actual_time"] = f"{new_hour:02d}:{new_minute:02d}"
+            train["actual_time"] = min_to_hhmm(_scheduled_min[train_id] + update.delay)
         if update.platform:
-            mock_trains[train_index]["platform"] = update.platform
+            train["platform"] = update.platform
         
-        return APIResponse(
-            status="success",
-            message=f"Train {train_id} updated successfully",
-            timestamp=datetime.now().isoformat()
-        )
+        return ORJSONResponse({
+            "status": "success",
+            "message": f"Train {train_id} updated successfully",
+            "data": None,
+            "timestamp": timestamp
+        })
     
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update train: {str(e)}")
 
-@router.post("/priority/recalculate", response_model=APIResponse)
-async def recalculate_priorities():
+@router.post("/priority/recalculate", response_model=None, responses={200: {"model": APIResponse}})
+async def recalculate_priorities(timestamp: str = Depends(now_iso)):
     """
     Trigger AI-based priority recalculation for all trains
     """
     try:
+        _trains_changed()  # train data is about to change
+        
         # Simulate AI priority recalculation
         for train in mock_trains:
             # Mock AI logic for priority adjustment
@@ -169,20 +226,20 @@ async def recalculate_priorities():
                 train["priority"] = min(5, train["priority"] + 1)  # Decrease priority
         
         # Sort by new priorities
-        mock_trains.sort(key=lambda x: x["priority"])
-        
-        return APIResponse(
-            status="success", 
-            message="AI priority recalculation completed",
-            data={"affected_trains": len(mock_trains)},
-            timestamp=datetime.now().isoformat()
-        )
+        mock_trains.sort(key=_by_priority)
+        
+        return ORJSONResponse({
+            "status": "success", 
+            "message": "AI priority recalculation completed",
+            "data": {"affected_trains": len(mock_trains)},
+            "timestamp": timestamp
+        })
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Priority recalculation failed: {str(e)}")
 
-@router.get("/priority/recommendations", response_model=APIResponse)
-async def get_priority_recommendations():
+@router.get("/priority/recommendations", response_model=None, responses={200: {"model": APIResponse}})
+async def get_priority_recommendations(timestamp: str = Depends(now_iso)):
     """
     Get AI-generated recommendations for train priority adjustments
     """
@@ -208,45 +265,46 @@ async def get_priority_recommendations():
                     "confidence": 0.76
                 })
         
-        return APIResponse(
-            status="success",
-            message=f"Generated {len(recommendations)} priority recommendations",
-            data=recommendations,
-            timestamp=datetime.now().isoformat()
-        )
+        return ORJSONResponse({
+            "status": "success",
+            "message": f"Generated {len(recommendations)} priority recommendations",
+            "data": recommendations,
+            "timestamp": timestamp
+        })
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate recommendations: {str(e)}")
 
-@router.post("/simulate/delay/{train_id}", response_model=APIResponse)
-async def simulate_train_delay(train_id: str, delay_minutes: int = Query(..., description="Delay in minutes")):
+@router.post("/simulate/delay/{train_id}", response_model=None, responses={200: {"model": APIResponse}})
+async def simulate_train_delay(
+    train_id: str,
+    delay_minutes: int = Query(..., description="Delay in minutes"),
+    timestamp: str = Depends(now_iso)
+):
     """
     Simulate a delay for a specific train (for testing purposes)
     """
     try:
-        train_index = next((i for i, t in enumerate(mock_trains) if t["id"] == train_id), None)
+        _trains_changed()  # train data is about to change
         
-        if train_index is None:
+        train = mock_trains_index.get(train_id)
+        
+        if train is None:
             raise HTTPException(status_code=404, detail=f"Train {train_id} not found")
         
         # Apply delay
-        mock_trains[train_index]["delay"] = delay_minutes
-        mock_trains[train_index]["status"] = "Delayed" if delay_minutes > 0 else "On Time"
+        train["delay"] = delay_minutes
+        train["status"] = "Delayed" if delay_minutes > 0 else "On Time"
         
         # Update actual time
-        scheduled_time = mock_trains[train_index]["scheduled_time"]
-        hour, minute = map(int, scheduled_time.split(":"))
-        new_minute = minute + delay_minutes
-        new_hour = hour + new_minute // 60
-        new_minute = new_minute % 60
-        mock_trains[train_index]["actual_time"] = f"{new_hour:02d}:{new_minute:02d}"
-        
-        return APIResponse(
-            status="success",
-            message=f"Simulated {delay_minutes}-minute delay for train {train_id}",
-            data=mock_trains[train_index],
-            timestamp=datetime.now().isoformat()
-        )
+        train["actual_time"] = min_to_hhmm(_scheduled_min[train_id] + delay_minutes)
+        
+        return ORJSONResponse({
+            "status": "success",
+            "message": f"Simulated {delay_minutes}-minute delay for train {train_id}",
+            "data": train,
+            "timestamp": timestamp
+        })
     
     except HTTPException:
         raise
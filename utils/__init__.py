@@ -0,0 +1,2 @@
+# utils/__init__.py - Utils Package Initializer
+# This file makes the utils directory a Python package
\ No newline at end of file
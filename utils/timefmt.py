@@ -0,0 +1,17 @@
+# utils/timefmt.py - Shared HH:MM Time Helpers
+# "HH:MM" for every minute of the day, and the reverse mapping for parsing
+HHMM = tuple(f"{h:02d}:{m:02d}" for h in range(24) for m in range(60))
+_MIN_BY_HHMM = {hhmm: i for i, hhmm in enumerate(HHMM)}
+
+def min_to_hhmm(minutes: int) -> str:
+    """Format minutes from midnight as "HH:MM", wrapping past midnight"""
+    return HHMM[minutes % 1440]
+
+def hhmm_to_min(hhmm: str) -> int:
+    """Convert a time string (HH:MM) to minutes from midnight"""
+    minutes = _MIN_BY_HHMM.get(hhmm)
+    if minutes is None:
+        # Not zero-padded or out of range, parse it the slow way
+        hour, minute = map(int, hhmm.split(":"))
+        minutes = hour * 60 + minute
+    return minutes